@@ -0,0 +1,47 @@
+"""
+Run the API server: ``python -m app [--workers N] [--generation-workers N]``.
+
+Worker processes are spawned and import ``app.main`` themselves; starting
+them from this module rather than from ``app.main`` keeps each one from
+building the app twice (multiprocessing re-runs a parent's main module in
+its children unless that module is a ``__main__``).
+
+Nothing from the app is imported here: with a single worker uvicorn serves
+``app.main`` in this process, and modules imported before the settings
+below are put in the environment would keep their defaults.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+
+import uvicorn
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the VIBE API server")
+    parser.add_argument("--host", default="0.0.0.0", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8001, help="Port to run the server on")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")),
+                        help="Server processes; they share generated series through SHARED_CACHE_DIR")
+    parser.add_argument("--generation-workers", type=int, default=int(os.getenv("GENERATION_WORKERS", "0")),
+                        help="Processes per server process generating series not yet cached (0 uses threads)")
+    args = parser.parse_args()
+
+    # Workers import the app afresh, so settings reach them through the environment
+    os.environ["GENERATION_WORKERS"] = str(args.generation_workers)
+    run_dir = None
+    if (args.workers > 1 or args.generation_workers > 0) and not os.getenv("SHARED_CACHE_DIR"):
+        # A fresh directory per run, in memory where available
+        run_dir = tempfile.mkdtemp(prefix="vibe-series-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+        os.environ["SHARED_CACHE_DIR"] = run_dir
+    try:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        if run_dir is not None:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Reader for the Parquet archive written by ``process_gdelt.py --parquet-dir``.
+
+The archive holds every parsed GDELT row in a dataset partitioned by day
+(``day=YYYY-MM-DD/<GDELT file>.parquet``). Long timeline windows aggregate
+it instead of the OLTP database:
+
+* the day range is pushed down to the dataset, so only the partitions in
+  the window are opened, and only the columns needed are decoded
+* files are memory-mapped rather than read into buffers
+* rows are filtered by symbol and aggregated per day in Arrow, so memory
+  grows with the rows of the window only while they are scanned, and no
+  row is ever converted to a Python or pandas object
+
+Requires pyarrow; the archive is only used when ``ARCHIVE_DIR`` is set.
+"""
+
+import os
+import threading
+import time
+from datetime import date
+from typing import List, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    from pyarrow.fs import LocalFileSystem
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+from app.db import GENERAL_SYMBOL
+from app.metrics import timed
+
+# Parquet dataset directory; empty disables the archive
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "")
+# Timelines of at least this many days are served from the archive
+ARCHIVE_MIN_DAYS = int(os.getenv("ARCHIVE_MIN_DAYS", "90"))
+# Archived mentions files; the same event is mentioned in many of them, so
+# only their IDs repeat across files (each file is deduplicated on writing)
+MENTIONS_FILE = ".mentions."
+# Seconds before the archive's file listing is refreshed to pick up new files
+ARCHIVE_REFRESH_SECONDS = float(os.getenv("ARCHIVE_REFRESH_SECONDS", "60"))
+
+# (ISO date, article count, articles with a sentiment, sentiment sum,
+#  GDELT ID of the day's newest article)
+DailyTotals = List[Tuple[str, int, int, float, str]]
+
+
+class ParquetArchive:
+    def __init__(self, path: str = ARCHIVE_DIR, refresh_seconds: float = ARCHIVE_REFRESH_SECONDS):
+        if pa is None:
+            raise RuntimeError("ARCHIVE_DIR requires pyarrow (pip install pyarrow)")
+        self.path = path
+        # Nothing may have been archived yet
+        os.makedirs(path, exist_ok=True)
+        self.refresh_seconds = refresh_seconds
+        # Same columns as the ingestion sink writes, plus the partition key
+        self.schema = pa.schema([
+            ("gdelt_id", pa.string()),
+            ("date", pa.timestamp("s")),
+            ("source", pa.string()),
+            ("url", pa.string()),
+            ("tone", pa.float32()),
+            ("sentiment", pa.float64()),
+            ("entities", pa.string()),
+            ("symbols", pa.list_(pa.string())),
+            ("day", pa.date32()),
+        ])
+        self._partitioning = ds.partitioning(pa.schema([("day", pa.date32())]), flavor="hive")
+        self._filesystem = LocalFileSystem(use_mmap=True)
+        self._lock = threading.Lock()
+        self._datasets: List["ds.Dataset"] = []
+        self._listed = 0.0
+
+    def _open(self, source) -> "ds.Dataset":
+        return ds.dataset(
+            source,
+            schema=self.schema,
+            format="parquet",
+            partitioning=self._partitioning,
+            partition_base_dir=self.path,
+            filesystem=self._filesystem,
+        )
+
+    def datasets(self) -> Tuple["ds.Dataset", "ds.Dataset"]:
+        """
+        The archive as (files with unique IDs, mentions files), re-listed
+        every ``refresh_seconds`` so newly archived files are seen.
+        """
+        with self._lock:
+            if not self._datasets or time.monotonic() - self._listed >= self.refresh_seconds:
+                files = self._open(self.path).files
+                self._datasets = [
+                    self._open([path for path in files if (MENTIONS_FILE in os.path.basename(path)) == mentions])
+                    for mentions in (False, True)
+                ]
+                self._listed = time.monotonic()
+            return self._datasets[0], self._datasets[1]
+
+    def _scan(self, dataset: "ds.Dataset", symbol: str, first: date, last: date) -> "pa.Table":
+        """(day, gdelt_id, sentiment) of the rows in [first, last] mentioning ``symbol``"""
+        by_symbol = symbol != GENERAL_SYMBOL
+        columns = ["day", "gdelt_id", "sentiment"] + (["symbols"] if by_symbol else [])
+        table = dataset.to_table(columns=columns, filter=(ds.field("day") >= first) & (ds.field("day") <= last))
+        if by_symbol:
+            symbols = table.column("symbols")
+            mentions = pc.equal(pc.list_flatten(symbols), symbol)
+            table = table.take(pc.unique(pc.filter(pc.list_parent_indices(symbols), mentions)))
+        return table.select(["day", "gdelt_id", "sentiment"])
+
+    def daily(self, symbol: str, first: date, last: date) -> DailyTotals:
+        """
+        Per-day totals of the articles dated within [first, last] that
+        mention ``symbol`` (every article for GENERAL), oldest day first.
+        """
+        unique, mentions = self.datasets()
+        with timed("query"):
+            table = self._scan(unique, symbol, first, last)
+            if mentions.files:
+                mentioned = self._scan(mentions, symbol, first, last)
+                # The same event is mentioned in many files; count it once,
+                # on its first day, as the database's unique gdelt_id does
+                mentioned = mentioned.group_by("gdelt_id", use_threads=False).aggregate(
+                    [("day", "first"), ("sentiment", "first")]
+                ).rename_columns(["gdelt_id", "day", "sentiment"])
+                table = pa.concat_tables([table, mentioned.select(["day", "gdelt_id", "sentiment"])])
+            if table.num_rows == 0:
+                return []
+
+            ids = table.column("gdelt_id")
+            sentiment = table.column("sentiment")
+            table = table.set_column(
+                2, "sentiment", pc.if_else(pc.is_nan(sentiment), pa.scalar(None, pa.float64()), sentiment)
+            )
+            # Newest is the highest ID, as in the rollups. IDs are decimal
+            # strings, so left-padding them to one length orders them by value
+            width = pc.max(pc.utf8_length(ids)).as_py()
+            table = table.append_column("top", pc.utf8_lpad(ids, width=width, padding="0"))
+            # NaN sentiments are left out of the count and sum, as in the rollups
+            grouped = table.group_by("day").aggregate([
+                ("gdelt_id", "count", pc.CountOptions(mode="all")),
+                ("sentiment", "count"),
+                ("sentiment", "sum"),
+                ("top", "max"),
+            ]).sort_by("day")
+        return [
+            (day.isoformat(), count, scored, total or 0.0, top.lstrip("0"))
+            for day, count, scored, total, top in zip(*(
+                grouped.column(name).to_pylist()
+                for name in ("day", "gdelt_id_count", "sentiment_count", "sentiment_sum", "top_max")
+            ))
+        ]
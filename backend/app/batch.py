@@ -0,0 +1,36 @@
+"""
+Multi-symbol (watchlist) requests.
+
+Every series for the same (days, anchor) shares one date axis, so a batch is
+returned as a single columnar payload: the dates once, then each symbol's
+remaining columns keyed by symbol.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, NamedTuple
+
+from app.metrics import timed
+from app.responses import as_list
+
+# Threads used to build the series of one batch concurrently
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "8"))
+
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+
+
+def unique_symbols(symbols: Iterable[str]) -> List[str]:
+    """Drop duplicate symbols, keeping the first occurrence's position."""
+    return list(dict.fromkeys(symbol.strip() for symbol in symbols if symbol.strip()))
+
+
+def merge_batch(symbols: List[str], results: List[NamedTuple]) -> Dict[str, Any]:
+    """Merge per-symbol series into ``{"date": [...], "series": {symbol: {...}}}``."""
+    with timed("join"):
+        payload: Dict[str, Any] = {"date": as_list(results[0].date) if results else [], "series": {}}
+        for symbol, series in zip(symbols, results):
+            payload["series"][symbol] = {
+                name: as_list(values) for name, values in series._asdict().items() if name != "date"
+            }
+        return payload
+
@@ -0,0 +1,247 @@
+"""
+Server-side response cache for the GET data routes.
+
+Responses are cached whole, body and headers as first sent, keyed by path,
+sorted query parameters and negotiated format, with a strong ETag over the
+body. A request
+whose ``If-None-Match`` carries that ETag gets a 304 straight from the cache,
+without running the route or serialising anything.
+
+Entries are tagged with the symbol they were built for (the ``symbol`` query
+parameter, or the ticker of ``/api/market/{ticker}``) and dropped when new
+data is recorded for that symbol, when ingestion posts to
+``/api/cache/invalidate``, or when the calendar day rolls over. The cache is
+an LRU bounded by ``RESPONSE_CACHE_MAX_BYTES``.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.db import GENERAL_SYMBOL
+from app.responses import BINARY_MEDIA_TYPE, wants_binary
+
+# Upper bound on the bytes of cached bodies and headers
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Seconds clients may reuse a response without revalidating (0 always revalidates)
+RESPONSE_CACHE_MAX_AGE = int(os.getenv("RESPONSE_CACHE_MAX_AGE", "0"))
+# Path prefixes whose GET responses are cached
+RESPONSE_CACHE_PATHS = ("/api/market/", "/api/news", "/api/timeline")
+# Shared secret required by POST /api/cache/invalidate when set
+CACHE_INVALIDATE_TOKEN = os.getenv("CACHE_INVALIDATE_TOKEN", "")
+
+Headers = List[Tuple[bytes, bytes]]
+CacheKey = Tuple[str, Tuple[Tuple[str, str], ...], str]
+
+
+class CachedResponse(NamedTuple):
+    status: int
+    headers: Headers  # without Content-Length
+    body: bytes
+    etag: bytes
+    symbol: str
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(name) + len(value) for name, value in self.headers)
+
+
+def _cache_epoch() -> Tuple[date, date]:
+    # Windows end at the local date; a change of either date rolls every entry over
+    return date.today(), datetime.now(timezone.utc).date()
+
+
+def make_etag(body: bytes) -> bytes:
+    return b'"' + hashlib.blake2b(body, digest_size=16).hexdigest().encode() + b'"'
+
+
+def etag_matches(if_none_match: Optional[bytes], etag: bytes) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(b",")]
+    return b"*" in candidates or etag in candidates or b"W/" + etag in candidates
+
+
+class ResponseCache:
+    """Byte-bounded LRU of responses, invalidated per symbol or all at once."""
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._epoch = _cache_epoch()
+        # Bumped on every invalidation; responses computed across one are not stored
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(scope: Scope) -> Tuple[CacheKey, str]:
+        """The cache key of a request and the symbol its response depends on"""
+        path = scope["path"]
+        params = tuple(sorted(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)))
+        accept = dict(scope["headers"]).get(b"accept", b"").decode("latin-1")
+        media_type = BINARY_MEDIA_TYPE if wants_binary(accept) else ""
+        symbol = dict(params).get("symbol", GENERAL_SYMBOL)
+        if path.startswith("/api/market/"):
+            symbol = path[len("/api/market/"):]
+        return (path, params, media_type), symbol
+
+    def _roll_over(self):
+        epoch = _cache_epoch()
+        if epoch != self._epoch:
+            self._epoch = epoch
+            self._clear()
+
+    def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
+        self._generation += 1
+
+    def _discard(self, key: CacheKey):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    @property
+    def generation(self) -> int:
+        with self._lock:
+            self._roll_over()
+            return self._generation
+
+    def get(self, key: CacheKey) -> Optional[CachedResponse]:
+        with self._lock:
+            self._roll_over()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: CacheKey, entry: CachedResponse, generation: int):
+        size = entry.size
+        with self._lock:
+            self._roll_over()
+            if generation != self._generation or size > self.max_bytes:
+                return
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, symbols: Optional[Iterable[str]] = None):
+        """Drop entries of ``symbols`` (and GENERAL, which covers them all), or everything"""
+        with self._lock:
+            self.invalidations += 1
+            if symbols is None:
+                self._clear()
+                return
+            stale = set(symbols) | {GENERAL_SYMBOL}
+            for key in [key for key, entry in self._entries.items() if entry.symbol in stale]:
+                self._discard(key)
+            self._generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRatio": self.hits / lookups if lookups else 0.0,
+                "notModified": self.not_modified,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def cache_control() -> bytes:
+    if RESPONSE_CACHE_MAX_AGE > 0:
+        return f"public, max-age={RESPONSE_CACHE_MAX_AGE}".encode()
+    return b"public, no-cache"
+
+
+class ResponseCacheMiddleware:
+    """ASGI middleware serving cached GET responses and answering conditional requests."""
+
+    def __init__(self, app: ASGIApp, cache: ResponseCache, paths: Tuple[str, ...] = RESPONSE_CACHE_PATHS):
+        self.app = app
+        self.cache = cache
+        self.paths = paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "GET" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = dict(scope["headers"]).get(b"if-none-match")
+        key, symbol = self.cache.key(scope)
+        entry = self.cache.get(key)
+        if entry is None:
+            generation = self.cache.generation
+            entry = await self._render(scope, receive, send, symbol)
+            if entry is None:
+                return
+            if entry.status == 200:
+                self.cache.put(key, entry, generation)
+
+        if entry.status == 200 and etag_matches(if_none_match, entry.etag):
+            self.cache.not_modified += 1
+            await self._send(send, 304, [(b"etag", entry.etag), (b"cache-control", cache_control())], b"")
+        else:
+            await self._send(send, entry.status, entry.headers, entry.body)
+
+    async def _render(self, scope: Scope, receive: Receive, send: Send, symbol: str) -> Optional[CachedResponse]:
+        """Run the route and capture its response; returns None if it was streamed through instead"""
+        start: Dict[str, Any] = {}
+        chunks: List[bytes] = []
+        streaming = False
+
+        async def capture(message: Message):
+            nonlocal streaming
+            if streaming:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                start.update(message)
+            else:
+                chunks.append(message.get("body", b""))
+                if message.get("more_body", False) and len(chunks) == 1:
+                    # Streamed bodies are passed through uncached
+                    streaming = True
+                    await send(start)
+                    await send(message)
+
+        await self.app(scope, receive, capture)
+        if streaming:
+            return None
+
+        body = b"".join(chunks)
+        etag = make_etag(body)
+        headers = [(name, value) for name, value in start.get("headers", []) if name.lower() != b"content-length"]
+        headers += [(b"etag", etag), (b"cache-control", cache_control())]
+        return CachedResponse(start["status"], headers, body, etag, symbol)
+
+    @staticmethod
+    async def _send(send: Send, status: int, headers: Headers, body: bytes):
+        headers = headers + [(b"content-length", str(len(body)).encode())]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,362 @@
+"""
+Pluggable data sources for the news and timeline routes.
+
+``DATA_SOURCE`` selects the backend:
+
+* ``database``  reads ``news_articles`` (written by process_gdelt.py) through
+                a pooled async engine; PostgreSQL or SQLite depending on
+                ``DATABASE_URL``. Startup fails if ingestion has not created
+                the tables yet.
+* ``mock``      the deterministic in-memory generators. The default.
+
+With the database backend and ``ARCHIVE_DIR`` set, timelines of at least
+``ARCHIVE_MIN_DAYS`` days are aggregated from the Parquet archive instead of
+the database; only the newest article of each day is looked up there.
+
+Market bars are always generated; only news comes from the database.
+
+``news_updates`` feeds the live stream: the mock backend publishes items
+from ``MockNewsFeed``, the database backends return articles ingested since
+the previous call.
+"""
+
+import os
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, inspect, select, tuple_
+from starlette.concurrency import run_in_threadpool
+
+from app import db
+from app.archive import ARCHIVE_DIR, ARCHIVE_MIN_DAYS, ParquetArchive
+from app.market import load_market_series
+from app.metrics import timed
+from app.models import NewsItem
+from app.news import MockNewsFeed, NewsStore, news_store
+from app.timeline import NewsUpdate, TimelineEngine, TimelineSeries, assemble_timeline, timeline_engine
+
+NewsPage = Tuple[List[NewsItem], Optional[int]]
+
+# Items per news page when the request sets no limit, and the most it may ask for
+NEWS_PAGE_SIZE = int(os.getenv("NEWS_PAGE_SIZE", "500"))
+NEWS_MAX_PAGE_SIZE = int(os.getenv("NEWS_MAX_PAGE_SIZE", "1000"))
+
+
+def page_size(limit: Optional[int]) -> int:
+    return min(limit or NEWS_PAGE_SIZE, NEWS_MAX_PAGE_SIZE)
+
+
+class DataSource:
+    """Interface shared by the backends. Windows end the day before today."""
+
+    name = ""
+
+    async def news_window(
+        self, symbol: str, days: int, limit: Optional[int] = None, cursor: Optional[int] = None
+    ) -> NewsPage:
+        """News for the last ``days`` days, newest first, paged like ``news_range``."""
+        today = date.today()
+        return await self.news_range(symbol, today - timedelta(days=days), today - timedelta(days=1), limit, cursor)
+
+    async def news_item(self, news_id: int, symbol: str) -> Optional[NewsItem]:
+        raise NotImplementedError
+
+    async def news_range(
+        self, symbol: str, first: date, last: date, limit: Optional[int] = None, cursor: Optional[int] = None
+    ) -> NewsPage:
+        """
+        News dated within [first, last], newest first, and the cursor for the
+        next page. Pages hold ``limit`` items, ``NEWS_PAGE_SIZE`` by default
+        and at most ``NEWS_MAX_PAGE_SIZE``. Raises ``KeyError`` for an
+        unknown cursor.
+        """
+        raise NotImplementedError
+
+    async def timeline(self, symbol: str, days: int, anchor: Optional[date] = None) -> TimelineSeries:
+        """The ``days`` days before ``anchor`` (today by default)."""
+        raise NotImplementedError
+
+    async def news_updates(self, symbols: List[str], limit: int) -> List[NewsUpdate]:
+        """
+        News for ``symbols`` published since the previous call, oldest first
+        and at most ``limit`` of the newest. Called by a single producer.
+        """
+        raise NotImplementedError
+
+    async def check(self):
+        """Raise ``RuntimeError`` if the backend cannot serve requests; called at startup."""
+
+    async def close(self):
+        pass
+
+
+class MockDataSource(DataSource):
+    name = "mock"
+
+    def __init__(self, store: NewsStore, engine: TimelineEngine, feed: MockNewsFeed):
+        self._store = store
+        self._engine = engine
+        self._feed = feed
+
+    async def news_item(self, news_id: int, symbol: str) -> Optional[NewsItem]:
+        return await run_in_threadpool(self._store.get, news_id, symbol)
+
+    async def news_range(self, symbol, first, last, limit=None, cursor=None) -> NewsPage:
+        return await run_in_threadpool(self._store.date_range, symbol, first, last, page_size(limit), cursor)
+
+    async def timeline(self, symbol: str, days: int, anchor: Optional[date] = None) -> TimelineSeries:
+        return await run_in_threadpool(self._engine.timeline, symbol, days, anchor)
+
+    def _publish(self, symbols: List[str], limit: int) -> List[NewsUpdate]:
+        updates = [self._engine.add_news(symbol, item) for symbol, item in self._feed.poll(symbols)[-limit:]]
+        return [update for update in updates if update is not None]
+
+    async def news_updates(self, symbols: List[str], limit: int) -> List[NewsUpdate]:
+        return await run_in_threadpool(self._publish, symbols, limit)
+
+
+class DatabaseDataSource(DataSource):
+    """
+    Reads ``news_articles`` with index-backed date-range queries.
+
+    Statements are built once with bound parameters, so SQLAlchemy compiles
+    each a single time and asyncpg reuses its prepared statement per
+    connection. A symbol's news is found through the ``article_symbols``
+    index; GENERAL reads every article. Timelines read the
+    ``daily_sentiment`` rollups, one row per day, rather than grouping
+    articles.
+    """
+
+    name = "database"
+
+    def __init__(self, url: Optional[str] = None):
+        self._engine = db.create_engine(url or db.DATABASE_URL)
+        articles = self._table = db.news_articles
+        columns = [articles.c.id, articles.c.title, articles.c.source, articles.c.date,
+                   articles.c.sentiment, articles.c.summary, articles.c.url]
+        newest_first = (articles.c.date.desc(), articles.c.id.desc())
+        in_range = articles.c.date.between(bindparam("first"), bindparam("last"))
+
+        links = db.article_symbols
+        mentioning = select(*columns).join_from(links, articles, links.c.article_id == articles.c.id).where(
+            links.c.symbol == bindparam("symbol")
+        )
+        after_cursor = tuple_(articles.c.date, articles.c.id) < tuple_(bindparam("cursor_date"), bindparam("cursor_id"))
+
+        self._by_id = select(*columns).where(articles.c.id == bindparam("id"))
+        # (range_page, range_after_page) for every article and for one symbol
+        self._ranges = {}
+        for by_symbol, base in ((False, select(*columns)), (True, mentioning)):
+            in_window = base.where(in_range).order_by(*newest_first).limit(bindparam("limit"))
+            self._ranges[by_symbol] = (in_window, in_window.where(after_cursor))
+        rollups = db.daily_sentiment
+        scored = func.coalesce(rollups.c.scored_count, rollups.c.count)
+        self._daily = select(
+            rollups.c.date, rollups.c.count, scored, rollups.c.sentiment_sum, rollups.c.top_article_id
+        ).where(
+            rollups.c.symbol == bindparam("symbol"),
+            rollups.c.date.between(bindparam("first"), bindparam("last")),
+        )
+        self._by_ids = select(*columns).where(articles.c.id.in_(bindparam("ids", expanding=True)))
+        self._by_gdelt_ids = select(*columns, articles.c.gdelt_id).where(
+            articles.c.gdelt_id.in_(bindparam("gdelt_ids", expanding=True))
+        )
+
+        # Live updates: the newest articles in (after, upto] and the rollups of their days
+        self._max_id = select(func.max(articles.c.id))
+        newer = (articles.c.id > bindparam("after")) & (articles.c.id <= bindparam("upto"))
+        subscribed = bindparam("symbols", expanding=True)
+        self._newer = select(*columns).where(newer).order_by(articles.c.id.desc()).limit(bindparam("limit"))
+        self._newer_mentions = (
+            select(*columns, links.c.symbol)
+            .join_from(links, articles, links.c.article_id == articles.c.id)
+            .where(newer, links.c.symbol.in_(subscribed))
+            .order_by(articles.c.id.desc())
+            .limit(bindparam("limit"))
+        )
+        self._rollups_of = select(
+            rollups.c.symbol, rollups.c.date, rollups.c.count, scored, rollups.c.sentiment_sum
+        ).where(
+            rollups.c.symbol.in_(subscribed), rollups.c.date.in_(bindparam("dates", expanding=True))
+        )
+        self._seen: Optional[int] = None
+
+    @staticmethod
+    def _item(row) -> NewsItem:
+        return NewsItem(
+            id=row.id,
+            title=row.title or "",
+            source=row.source or "Unknown",
+            date=row.date.isoformat(),
+            sentiment=row.sentiment or 0.0,
+            summary=row.summary or "",
+            url=row.url,
+        )
+
+    async def _fetch(self, statement, **params) -> List[NewsItem]:
+        with timed("query"):
+            async with self._engine.connect() as conn:
+                result = await conn.execute(statement, params)
+                return [self._item(row) for row in result]
+
+    def _range_statements(self, symbol: str, params: Dict[str, Any]):
+        by_symbol = symbol != db.GENERAL_SYMBOL
+        if by_symbol:
+            params["symbol"] = symbol
+        return self._ranges[by_symbol]
+
+    async def news_item(self, news_id: int, symbol: str) -> Optional[NewsItem]:
+        items = await self._fetch(self._by_id, id=news_id)
+        return items[0] if items else None
+
+    async def news_range(self, symbol, first, last, limit=None, cursor=None) -> NewsPage:
+        limit = page_size(limit)
+        params: Dict[str, Any] = dict(first=first, last=last, limit=limit)
+        window_page, after_page = self._range_statements(symbol, params)
+        if cursor is not None:
+            anchor = await self.news_item(cursor, symbol)
+            if anchor is None:
+                raise KeyError(cursor)
+            params.update(cursor_date=date.fromisoformat(anchor.date), cursor_id=cursor)
+            items = await self._fetch(after_page, **params)
+        else:
+            items = await self._fetch(window_page, **params)
+
+        # A full page may be followed by more rows
+        next_cursor = items[-1].id if len(items) == limit else None
+        return items, next_cursor
+
+    async def timeline(self, symbol: str, days: int, anchor: Optional[date] = None) -> TimelineSeries:
+        if anchor is None:
+            anchor = date.today()
+        market = await load_market_series(symbol, days, anchor)
+        first, last = anchor - timedelta(days=days), anchor - timedelta(days=1)
+
+        with timed("query"):
+            async with self._engine.connect() as conn:
+                params = {"symbol": symbol, "first": first, "last": last}
+                daily_rows = (await conn.execute(self._daily, params)).all()
+                top_ids = [row[4] for row in daily_rows]
+                tops = {}
+                if top_ids:
+                    for row in await conn.execute(self._by_ids, {"ids": top_ids}):
+                        tops[row.id] = self._item(row).dict()
+
+        daily: Dict[str, Tuple[int, float, Optional[Dict[str, Any]]]] = {
+            day.isoformat(): (count, total / scored if scored else 0.0, tops.get(top_id))
+            for day, count, scored, total, top_id in daily_rows
+        }
+        return assemble_timeline(market, daily)
+
+    async def check(self):
+        async with self._engine.connect() as conn:
+            tables = set(await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names()))
+        missing = sorted(set(db.metadata.tables) - tables)
+        if missing:
+            raise RuntimeError(
+                f"Database {self._engine.url.render_as_string(hide_password=True)} has no "
+                f"{', '.join(missing)} table(s); run data_processing/scripts/process_gdelt.py to "
+                "create and fill them, or set DATA_SOURCE=mock"
+            )
+
+    async def news_updates(self, symbols: List[str], limit: int) -> List[NewsUpdate]:
+        with timed("query"):
+            async with self._engine.connect() as conn:
+                upto = (await conn.execute(self._max_id)).scalar() or 0
+                after, self._seen = self._seen, upto
+                if after is None or upto <= after or not symbols:
+                    # The first call only records where to start from
+                    return []
+                params = {"after": after, "upto": upto, "limit": limit}
+                rows = []
+                tickers = [symbol for symbol in symbols if symbol != db.GENERAL_SYMBOL]
+                if tickers:
+                    result = await conn.execute(self._newer_mentions, {**params, "symbols": tickers})
+                    rows += [(row.symbol, row) for row in result]
+                if db.GENERAL_SYMBOL in symbols:
+                    rows += [(db.GENERAL_SYMBOL, row) for row in await conn.execute(self._newer, params)]
+                if not rows:
+                    return []
+                result = await conn.execute(self._rollups_of, {
+                    "symbols": sorted({symbol for symbol, _ in rows}),
+                    "dates": sorted({row.date for _, row in rows}),
+                })
+                days = {
+                    (symbol, day): (count, total / scored if scored else 0.0)
+                    for symbol, day, count, scored, total in result
+                }
+        rows.sort(key=lambda pair: pair[1].id)
+        return [NewsUpdate(symbol, self._item(row), days.get((symbol, row.date))) for symbol, row in rows]
+
+    async def items_by_gdelt_id(self, gdelt_ids: List[str]) -> Dict[str, NewsItem]:
+        if not gdelt_ids:
+            return {}
+        with timed("query"):
+            async with self._engine.connect() as conn:
+                result = await conn.execute(self._by_gdelt_ids, {"gdelt_ids": gdelt_ids})
+                return {row.gdelt_id: self._item(row) for row in result}
+
+    async def close(self):
+        await self._engine.dispose()
+
+
+class ArchiveDataSource(DataSource):
+    """
+    The database backend, with long timelines aggregated from the Parquet
+    archive. Per-day counts and sentiment come from the archive; the newest
+    article of each day is resolved to its database row by GDELT ID, so
+    timeline items keep the IDs the news routes use.
+    """
+
+    name = "archive"
+
+    def __init__(self, database: DatabaseDataSource, archive: ParquetArchive, min_days: int = ARCHIVE_MIN_DAYS):
+        self._database = database
+        self._archive = archive
+        self._min_days = min_days
+
+    async def news_item(self, news_id: int, symbol: str) -> Optional[NewsItem]:
+        return await self._database.news_item(news_id, symbol)
+
+    async def news_range(self, symbol, first, last, limit=None, cursor=None) -> NewsPage:
+        return await self._database.news_range(symbol, first, last, limit, cursor)
+
+    async def timeline(self, symbol: str, days: int, anchor: Optional[date] = None) -> TimelineSeries:
+        if anchor is None:
+            anchor = date.today()
+        if days < self._min_days:
+            return await self._database.timeline(symbol, days, anchor)
+        market = await load_market_series(symbol, days, anchor)
+        first, last = anchor - timedelta(days=days), anchor - timedelta(days=1)
+
+        totals = await run_in_threadpool(self._archive.daily, symbol, first, last)
+        tops = await self._database.items_by_gdelt_id([top for _, _, _, _, top in totals])
+        daily: Dict[str, Tuple[int, float, Optional[Dict[str, Any]]]] = {
+            day: (count, total / scored if scored else 0.0, tops[top].dict() if top in tops else None)
+            for day, count, scored, total, top in totals
+        }
+        return assemble_timeline(market, daily)
+
+    async def news_updates(self, symbols: List[str], limit: int) -> List[NewsUpdate]:
+        return await self._database.news_updates(symbols, limit)
+
+    async def check(self):
+        await self._database.check()
+
+    async def close(self):
+        await self._database.close()
+
+
+def create_data_source(name: Optional[str] = None) -> DataSource:
+    """Instantiate the backend named by ``name`` or the ``DATA_SOURCE`` setting."""
+    if name is None:
+        # DATABASE_URL alone does not opt in: it is set wherever the ingestion
+        # scripts run, including before they have created any tables
+        name = os.getenv("DATA_SOURCE", "mock")
+    if name == "mock":
+        return MockDataSource(news_store, timeline_engine, MockNewsFeed())
+    if name == "database":
+        if ARCHIVE_DIR:
+            return ArchiveDataSource(DatabaseDataSource(), ParquetArchive(ARCHIVE_DIR))
+        return DatabaseDataSource()
+    raise ValueError(f"Unknown DATA_SOURCE {name!r}; expected 'database' or 'mock'")
@@ -0,0 +1,102 @@
+"""
+Async database access for the read path.
+
+The ``news_articles``, ``article_symbols`` and ``daily_sentiment`` tables are
+owned and populated by ``data_processing/scripts/process_gdelt.py``; they are
+mirrored here as Core tables so queries can be built without importing the
+ingestion script.
+"""
+
+import os
+
+from sqlalchemy import Column, Date, Float, Index, Integer, MetaData, String, Table, Text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./vibe.db")
+
+# Connection pool and query limits
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000"))
+# Prepared statements cached per connection (PostgreSQL)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+metadata = MetaData()
+
+news_articles = Table(
+    "news_articles",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("gdelt_id", String, unique=True, index=True),
+    Column("date", Date, index=True),
+    Column("title", String),
+    Column("source", String),
+    Column("url", String),
+    Column("sentiment", Float),
+    Column("tone", Float),
+    Column("summary", Text),
+)
+
+# Tickers each article mentions, indexed by (symbol, article_id)
+article_symbols = Table(
+    "article_symbols",
+    metadata,
+    Column("article_id", Integer, primary_key=True),
+    Column("symbol", String, primary_key=True),
+    Index("ix_article_symbols_symbol", "symbol", "article_id"),
+)
+
+# One row per (symbol, day), kept up to date as files are ingested
+daily_sentiment = Table(
+    "daily_sentiment",
+    metadata,
+    Column("symbol", String, primary_key=True),
+    Column("date", Date, primary_key=True),
+    Column("count", Integer, nullable=False),
+    # Divisor of the mean; NULL on rows written before it was tracked
+    Column("scored_count", Integer),
+    Column("sentiment_sum", Float, nullable=False),
+    Column("sentiment_min", Float),
+    Column("sentiment_max", Float),
+    Column("top_article_id", Integer),
+)
+
+# Symbol whose news and rollups cover every article, mentioned tickers or not
+GENERAL_SYMBOL = "GENERAL"
+
+# Async drivers for the synchronous URLs used across the project
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_url(url: str):
+    """Rewrite a sync database URL to use the matching async driver."""
+    parsed = make_url(url)
+    return parsed.set(drivername=_ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername))
+
+
+def create_engine(url: str = DATABASE_URL) -> AsyncEngine:
+    """Create a pooled async engine with the configured limits."""
+    parsed = async_url(url)
+    options = {"pool_pre_ping": True}
+    if parsed.database not in (None, "", ":memory:"):
+        # aiosqlite would otherwise default to NullPool and reconnect per query
+        options.update(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    if parsed.get_backend_name() == "postgresql":
+        parsed = parsed.update_query_dict({"prepared_statement_cache_size": str(DB_STATEMENT_CACHE_SIZE)})
+        options.update(connect_args={"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}})
+    elif parsed.get_backend_name() == "sqlite":
+        # SQLite has no statement timeout; bound the wait for a locked database instead
+        options.update(connect_args={"timeout": DB_STATEMENT_TIMEOUT_MS / 1000})
+    return create_async_engine(parsed, **options)
@@ -0,0 +1,49 @@
+"""
+Process pool for CPU-bound series generation.
+
+With ``GENERATION_WORKERS`` above 0, each server process generates series it
+does not have yet on a pool of that many processes instead of on its own
+threads, so a burst of cold requests does not hold the GIL that serves
+everything else. Results come back through the shared series cache rather
+than being pickled, which also makes them visible to every other worker;
+the pool is therefore only used while that cache is enabled.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+from app.shared_cache import shared_series
+
+# Generation processes per server process; 0 generates on the threadpool
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "0"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def generation_pool() -> Optional[ProcessPoolExecutor]:
+    """The pool, started on first use; None when generation stays in-process."""
+    global _pool
+    if GENERATION_WORKERS <= 0 or not shared_series.enabled:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # Forking a process that runs an event loop and threads is unsafe
+            _pool = ProcessPoolExecutor(GENERATION_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+async def run_in_generation_pool(fn: Callable[..., Any], *args: Any) -> Any:
+    return await asyncio.get_running_loop().run_in_executor(generation_pool(), fn, *args)
+
+
+def shutdown_generation_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
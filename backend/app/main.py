@@ -1,13 +1,28 @@
-from fastapi import FastAPI, HTTPException, Query, Depends
+from fastapi import FastAPI, HTTPException, Query, Depends, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from typing import List, Optional
-from datetime import datetime, timedelta
-import random
-import hashlib
-from pydantic import BaseModel
+from datetime import date, timedelta
+import asyncio
+
+from app.cache import CACHE_INVALIDATE_TOKEN, ResponseCacheMiddleware, response_cache
+from app.datasource import create_data_source
+from app.generation import shutdown_generation_pool
+from app.market import get_market_series, load_market_batch, load_market_series, market_cache_info
+from app.metrics import MetricsMiddleware, register_collector, render_metrics, timed
+from app.batch import merge_batch, unique_symbols
+from app.models import BatchRequest, CacheInvalidation, MarketData, NewsItem, TimelineData
+from app.news import MAX_LOOKBACK_DAYS, news_store
+from app.responses import ResponseFormat, columns_from_items, series_response
+from app.shared_cache import SHARED_CACHE_POLL_SECONDS, shared_series
+from app.stream import StreamHub
+from app.timeline import timeline_engine
 
 app = FastAPI(title="VIBE API", description="Visual Interactive Bloomberg Experience API")
 
+# Cached GET responses, with ETags for conditional requests
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -15,244 +30,271 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
-# Models
-class MarketData(BaseModel):
-    date: str
-    open: float
-    high: float
-    low: float
-    close: float
-    volume: int
-
-class NewsItem(BaseModel):
-    id: int
-    title: str
-    source: str
-    date: str
-    sentiment: float
-    summary: str
-    url: Optional[str] = None
-
-class TimelineData(BaseModel):
-    date: str
-    price: float
-    volume: int
-    sentiment: float
-    newsCount: int
-    news: Optional[NewsItem] = None
+# Outermost, so that cache hits and CORS preflights are measured too
+app.add_middleware(MetricsMiddleware, routes=app.routes)
 
-# Mock data generators
-def generate_market_data(ticker: str, days: int = 30) -> List[MarketData]:
-    data = []
-    start_date = datetime.now() - timedelta(days=days)
-    
-    # Seed for pseudo-random but consistent data for each symbol
-    symbol_seed = sum(ord(char) for char in ticker)
-    
-    price = 150 if ticker == "AAPL" else 100 + (symbol_seed % 200)
-    trend = (symbol_seed % 10) / 10  # Different trend direction based on symbol
-    
-    for i in range(days):
-        date = start_date + timedelta(days=i)
-        
-        # Generate price movement influenced by the symbol and day
-        day_influence = (i * (symbol_seed % 5) / 10)
-        random_factor = random.random() * 10 - 5
-        price_change = (random_factor + day_influence + trend) * (1 + (symbol_seed % 5) / 10)
-        
-        price += price_change
-        price = max(50, price)  # Ensure price doesn't go too low
-        
-        open_price = price
-        close_price = price + (random.random() - 0.5) * 3
-        high_price = max(open_price, close_price) + random.random() * 2
-        low_price = min(open_price, close_price) - random.random() * 2
-        volume = int(random.random() * 1000000 * (1 + (symbol_seed % 3) / 5) + 500000)
-        
-        data.append(MarketData(
-            date=date.strftime("%Y-%m-%d"),
-            open=open_price,
-            high=high_price,
-            low=low_price,
-            close=close_price,
-            volume=volume
-        ))
-    
-    return data
+# News and timeline routes read through the configured backend (DATA_SOURCE)
+data_source = create_data_source()
+stream_hub = StreamHub(data_source)
 
-def generate_news_data(ticker: str = "GENERAL", days: int = 30) -> List[NewsItem]:
-    # Use a deterministic seed for consistent news generation
-    random.seed(42 + sum(ord(char) for char in ticker))
-    
-    # Seed for pseudo-random but consistent data for each symbol
-    symbol_seed = sum(ord(char) for char in ticker)
-    
-    news_sources = ["Bloomberg", "CNBC", "Financial Times", "Wall Street Journal", "Reuters"]
-    
-    # Generate news titles based on the symbol
-    symbol_name = ticker if ticker != "GENERAL" else "Markets"
-    
-    positive_titles = [
-        f"{symbol_name} Surges on Strong Earnings Report",
-        f"Analysts Upgrade {symbol_name} Following Product Announcement",
-        f"{symbol_name} Gains as Sector Shows Growth",
-        f"New Partnership Boosts {symbol_name} Shares",
-        f"Central Bank Signals Continued Support"
-    ]
-    
-    negative_titles = [
-        f"{symbol_name} Drops After Missing Quarterly Expectations",
-        f"Regulatory Concerns Weigh on {symbol_name}",
-        f"{symbol_name} Falls as Competitors Gain Market Share",
-        "Federal Reserve Signals Potential Rate Hike",
-        "Retail Sales Decline for Second Consecutive Month"
+# News recorded in-process makes that symbol's cached responses stale
+timeline_engine.add_listener(lambda symbol, item, aggregate: response_cache.invalidate([symbol]))
+
+def cache_metrics():
+    response = response_cache.stats()
+    market = market_cache_info()
+    timeline = timeline_engine.cache_info()
+    shared = shared_series.stats()
+    caches = [
+        ("response", response["hits"], response["misses"], response["entries"]),
+        ("market", market.hits, market.misses, market.currsize),
+        ("timeline", timeline["hits"], timeline["misses"], timeline["entries"]),
     ]
-    
-    neutral_titles = [
-        f"{symbol_name} Holds Steady Ahead of Earnings",
-        f"Analysts Maintain Neutral Stance on {symbol_name}",
-        f"{symbol_name} Shows Mixed Signals in Volatile Market",
-        "Markets Mixed Ahead of Earnings Season",
-        "Oil Prices Stabilize Following Production Agreement"
+    return [
+        ("vibe_cache_hits_total", "counter", "Cache lookups that found an entry",
+         [({"cache": name}, hits) for name, hits, _, _ in caches]),
+        ("vibe_cache_misses_total", "counter", "Cache lookups that found nothing",
+         [({"cache": name}, misses) for name, _, misses, _ in caches]),
+        ("vibe_cache_hit_ratio", "gauge", "Hits over all lookups since startup",
+         [({"cache": name}, hits / (hits + misses) if hits + misses else 0.0) for name, hits, misses, _ in caches]),
+        ("vibe_cache_entries", "gauge", "Entries currently cached",
+         [({"cache": name}, entries) for name, _, _, entries in caches]),
+        ("vibe_response_cache_bytes", "gauge", "Body bytes held by the response cache",
+         [({}, response["bytes"])]),
+        ("vibe_response_cache_not_modified_total", "counter", "Conditional requests answered with 304",
+         [({}, response["notModified"])]),
+        ("vibe_response_cache_evictions_total", "counter", "Responses evicted to stay under the byte limit",
+         [({}, response["evictions"])]),
+        ("vibe_shared_cache_lookups_total", "counter", "Shared series cache lookups by this worker",
+         [({"result": "hit"}, shared["hits"]), ({"result": "miss"}, shared["misses"])]),
+        ("vibe_shared_cache_writes_total", "counter", "Series this worker wrote to the shared cache",
+         [({}, shared["writes"])]),
     ]
-    
-    # General market news that might affect any symbol
-    market_titles = [
-        "Federal Reserve Signals Potential Rate Hike",
-        "Inflation Concerns Weigh on Markets",
-        "Global Supply Chain Issues Begin to Ease",
-        "Economic Growth Exceeds Expectations",
-        "Market Volatility Increases Amid Geopolitical Tensions"
+
+register_collector(cache_metrics)
+
+async def follow_invalidations():
+    """Apply cache invalidations that reached another worker process."""
+    while True:
+        await asyncio.sleep(SHARED_CACHE_POLL_SECONDS)
+        for symbols in shared_series.read_invalidations():
+            response_cache.invalidate(symbols)
+
+background_tasks: List[asyncio.Task] = []
+
+@app.on_event("startup")
+async def startup():
+    # Fail fast rather than answer every request with a 500
+    await data_source.check()
+    await stream_hub.start()
+    if shared_series.enabled:
+        background_tasks.append(asyncio.create_task(follow_invalidations()))
+
+@app.on_event("shutdown")
+async def shutdown():
+    for task in background_tasks:
+        task.cancel()
+    await stream_hub.stop()
+    await data_source.close()
+    shutdown_generation_pool()
+
+# Mock data generators
+def generate_market_data(ticker: str, days: int = 30) -> List[MarketData]:
+    series = get_market_series(ticker, days)
+    return [
+        MarketData(date=d, open=o, high=h, low=l, close=c, volume=v)
+        for d, o, h, l, c, v in zip(
+            series.date.tolist(),
+            series.open.tolist(),
+            series.high.tolist(),
+            series.low.tolist(),
+            series.close.tolist(),
+            series.volume.tolist(),
+        )
     ]
-    
-    data = []
-    start_date = datetime.now() - timedelta(days=days)
-    
-    # Generate a fixed number of news items per day for consistency
-    news_per_day = {}
-    
-    # First, determine how many news items per day (0-3)
-    for i in range(days):
-        date = start_date + timedelta(days=i)
-        date_str = date.strftime("%Y-%m-%d")
-        
-        # Use a hash of the date and ticker to get a consistent number of news items
-        hash_input = f"{date_str}_{ticker}"
-        hash_value = int(hashlib.md5(hash_input.encode()).hexdigest(), 16)
-        news_count = hash_value % 4  # 0-3 news items per day
-        
-        news_per_day[date_str] = news_count
-    
-    # Now generate the news items
-    news_id = 1
-    for i in range(days):
-        date = start_date + timedelta(days=i)
-        date_str = date.strftime("%Y-%m-%d")
-        
-        for j in range(news_per_day[date_str]):
-            # Use a hash of the date, ticker, and news index to get consistent sentiment
-            hash_input = f"{date_str}_{ticker}_{j}"
-            hash_value = int(hashlib.md5(hash_input.encode()).hexdigest(), 16)
-            sentiment_base = (hash_value % 100) / 100.0  # 0.0 to 0.99
-            sentiment = (sentiment_base * 2 - 1)  # -1 to 1
-            
-            # Select news title based on sentiment and hash
-            is_symbol_specific = (hash_value % 100) > 30  # 70% symbol-specific news
-            
-            if not is_symbol_specific:
-                title = market_titles[hash_value % len(market_titles)]
-            elif sentiment > 0.3:
-                title = positive_titles[hash_value % len(positive_titles)]
-            elif sentiment < -0.3:
-                title = negative_titles[hash_value % len(negative_titles)]
-            else:
-                title = neutral_titles[hash_value % len(neutral_titles)]
-            
-            source = news_sources[hash_value % len(news_sources)]
-            
-            data.append(NewsItem(
-                id=news_id,
-                title=title,
-                source=source,
-                date=date_str,
-                sentiment=sentiment,
-                summary=f"This is a mock summary for the news item '{title}' on {date_str}."
-            ))
-            news_id += 1
-    
-    # Reset the random seed
-    random.seed()
-    
-    # Sort by date (newest first)
-    return sorted(data, key=lambda x: x.date, reverse=True)
+
+def generate_news_data(ticker: str = "GENERAL", days: int = 30) -> List[NewsItem]:
+    # Newest first
+    return news_store.window(ticker, days)
 
 def generate_timeline_data(ticker: str = "GENERAL", days: int = 30) -> List[TimelineData]:
-    market_data = generate_market_data(ticker, days)
-    news_data = generate_news_data(ticker, days)
-    
-    # Group news by date
-    news_by_date = {}
-    for news in news_data:
-        if news.date not in news_by_date:
-            news_by_date[news.date] = []
-        news_by_date[news.date].append(news)
-    
-    timeline_data = []
-    
-    for market in market_data:
-        date = market.date
-        news_for_date = news_by_date.get(date, [])
-        
-        # Calculate average sentiment for the day
-        sentiment = 0
-        if news_for_date:
-            sentiment = sum(news.sentiment for news in news_for_date) / len(news_for_date)
-        
-        timeline_data.append(TimelineData(
-            date=date,
-            price=market.close,
-            volume=market.volume,
-            sentiment=sentiment,
-            newsCount=len(news_for_date),
-            news=news_for_date[0] if news_for_date else None
-        ))
-    
-    return timeline_data
+    series = timeline_engine.timeline(ticker, days)
+    return [
+        TimelineData(date=d, price=p, volume=v, sentiment=s, newsCount=n, news=news)
+        for d, p, v, s, n, news in zip(
+            series.date.tolist(),
+            series.price.tolist(),
+            series.volume.tolist(),
+            series.sentiment.tolist(),
+            series.newsCount.tolist(),
+            series.news,
+        )
+    ]
 
 # API Routes
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Welcome to the VIBE API"}
 
+@app.post("/api/market/batch")
+async def get_market_batch(request: BatchRequest):
+    """OHLCV columns for several symbols over a shared date axis."""
+    symbols = unique_symbols(request.symbols)
+    payload = merge_batch(symbols, await load_market_batch(symbols, request.days))
+    with timed("serialize"):
+        return ORJSONResponse(payload)
+
 @app.get("/api/market/{ticker}", response_model=List[MarketData])
-def get_market_data(ticker: str, days: int = Query(30, ge=1, le=365)):
-    return generate_market_data(ticker, days)
+async def get_market_data(
+    ticker: str,
+    days: int = Query(30, ge=1, le=365),
+    fmt: ResponseFormat = Query(ResponseFormat.rows, alias="format"),
+    accept: Optional[str] = Header(None),
+):
+    """OHLCV bars; send ``Accept: application/vnd.vibe.columns`` for the packed binary layout."""
+    series = await load_market_series(ticker, days)
+    return series_response(series._asdict(), fmt, accept)
 
 @app.get("/api/news", response_model=List[NewsItem])
-def get_news_data(symbol: str = "GENERAL", days: int = Query(30, ge=1, le=365)):
-    return generate_news_data(symbol, days)
+async def get_news_data(
+    symbol: str = "GENERAL",
+    days: int = Query(30, ge=1, le=365),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[int] = None,
+    fmt: ResponseFormat = Query(ResponseFormat.rows, alias="format"),
+):
+    """
+    News for the last ``days`` days, newest first, in pages like
+    ``/api/news/date-range``.
+    """
+    try:
+        page, next_cursor = await data_source.news_window(symbol, days, limit, cursor)
+    except KeyError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return _page_response(page, next_cursor, fmt)
+
+def _page_response(page: List[NewsItem], next_cursor: Optional[int], fmt: ResponseFormat):
+    response = series_response(columns_from_items(page, list(NewsItem.__fields__)), fmt)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return response
+
+async def _news_page(symbol: str, first: date, last: date, limit: Optional[int], cursor: Optional[int], fmt: ResponseFormat):
+    if last < first:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    # Nothing is published after today
+    last = min(last, date.today())
+    if last < first:
+        return series_response(columns_from_items([], list(NewsItem.__fields__)), fmt)
+    if (last - first).days >= MAX_LOOKBACK_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range may span at most {MAX_LOOKBACK_DAYS} days")
+    if first < date.today() - timedelta(days=MAX_LOOKBACK_DAYS):
+        raise HTTPException(status_code=400, detail=f"Date range may reach back at most {MAX_LOOKBACK_DAYS} days")
+
+    try:
+        page, next_cursor = await data_source.news_range(symbol, first, last, limit, cursor)
+    except KeyError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return _page_response(page, next_cursor, fmt)
+
+@app.get("/api/news/date", response_model=List[NewsItem])
+async def get_news_for_date(
+    symbol: str = "GENERAL",
+    day: date = Query(..., alias="date"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[int] = None,
+    fmt: ResponseFormat = Query(ResponseFormat.rows, alias="format"),
+):
+    return await _news_page(symbol, day, day, limit, cursor, fmt)
+
+@app.get("/api/news/date-range", response_model=List[NewsItem])
+async def get_news_for_date_range(
+    symbol: str = "GENERAL",
+    start_date: date = Query(...),
+    end_date: date = Query(...),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[int] = None,
+    fmt: ResponseFormat = Query(ResponseFormat.rows, alias="format"),
+):
+    """
+    News between ``start_date`` and ``end_date`` inclusive, newest first,
+    at most ``limit`` items (``NEWS_PAGE_SIZE`` by default). When more remain, the
+    ``X-Next-Cursor`` response header carries the ``cursor`` to pass for the
+    next page.
+    """
+    return await _news_page(symbol, start_date, end_date, limit, cursor, fmt)
+
+@app.post("/api/timeline/batch")
+async def get_timeline_batch(request: BatchRequest):
+    """Timeline columns for several symbols over a shared date axis."""
+    symbols = unique_symbols(request.symbols)
+    # One anchor for every symbol, so the series share a date axis even across midnight
+    anchor = date.today()
+    results = await asyncio.gather(*(data_source.timeline(symbol, request.days, anchor) for symbol in symbols))
+    payload = merge_batch(symbols, list(results))
+    with timed("serialize"):
+        return ORJSONResponse(payload)
 
 @app.get("/api/timeline", response_model=List[TimelineData])
-def get_timeline_data(symbol: str = "GENERAL", days: int = Query(30, ge=1, le=365)):
-    return generate_timeline_data(symbol, days)
+async def get_timeline_data(
+    symbol: str = "GENERAL",
+    days: int = Query(30, ge=1, le=365),
+    fmt: ResponseFormat = Query(ResponseFormat.rows, alias="format"),
+    accept: Optional[str] = Header(None),
+):
+    """Daily timeline; send ``Accept: application/vnd.vibe.columns`` for the packed binary layout."""
+    series = await data_source.timeline(symbol, days)
+    return series_response(series._asdict(), fmt, accept)
 
 @app.get("/api/news/{news_id}", response_model=NewsItem)
-def get_news_item(news_id: int, symbol: str = "GENERAL"):
-    # In a real app, this would fetch from a database
-    news_data = generate_news_data(symbol, 30)
-    for news in news_data:
-        if news.id == news_id:
-            return news
-    raise HTTPException(status_code=404, detail="News item not found")
+async def get_news_item(news_id: int, symbol: str = "GENERAL"):
+    news = await data_source.news_item(news_id, symbol)
+    if news is None:
+        raise HTTPException(status_code=404, detail="News item not found")
+    return news
+
+@app.post("/api/cache/invalidate")
+async def invalidate_cache(request: CacheInvalidation, x_cache_token: str = Header("")):
+    """Called by ingestion after committing new data for ``symbols``."""
+    if CACHE_INVALIDATE_TOKEN and x_cache_token != CACHE_INVALIDATE_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid cache token")
+    response_cache.invalidate(request.symbols)
+    shared_series.publish_invalidation(request.symbols)
+    return {"invalidated": request.symbols if request.symbols is not None else "all"}
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    return response_cache.stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus text exposition of request, stage and cache metrics."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/stream")
+async def stream_timeline(
+    request: Request,
+    symbols: str = Query(..., description="Comma-separated symbols"),
+    days: int = Query(30, ge=1, le=365),
+):
+    """
+    Server-Sent Events: a ``snapshot`` per symbol, then ``news`` and
+    ``sentiment`` deltas as they happen.
+    """
+    symbol_list = unique_symbols(symbols.split(","))
+    if not symbol_list:
+        raise HTTPException(status_code=400, detail="At least one symbol is required")
+    subscriber = stream_hub.subscribe(symbol_list, days)
+    return StreamingResponse(
+        stream_hub.events(subscriber, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 if __name__ == "__main__":
-    import uvicorn
-    import argparse
-    
-    parser = argparse.ArgumentParser(description="Run the VIBE API server")
-    parser.add_argument("--port", type=int, default=8001, help="Port to run the server on")
-    args = parser.parse_args()
-    
-    uvicorn.run(app, host="0.0.0.0", port=args.port)
+    from app.__main__ import main
+
+    main()
@@ -0,0 +1,143 @@
+"""
+Vectorised mock market data engine.
+
+Bars are produced as columnar NumPy arrays in a single pass from a seeded
+``numpy.random.Generator``, so a given (ticker, days, anchor date) always
+yields the same series and can be cached: per process in an LRU, and
+across worker processes in the shared series cache.
+"""
+
+import asyncio
+import hashlib
+import os
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+from app.batch import batch_executor
+from app.generation import generation_pool, run_in_generation_pool
+from app.metrics import timed
+from app.shared_cache import shared_series
+
+# Maximum number of (ticker, days, anchor) series kept in memory
+MARKET_CACHE_SIZE = int(os.getenv("MARKET_CACHE_SIZE", "1024"))
+
+# Prices never fall below this floor
+PRICE_FLOOR = 50.0
+
+
+class MarketSeries(NamedTuple):
+    """OHLCV bars for one ticker as parallel, read-only arrays."""
+    date: np.ndarray    # '<U10' ISO dates, oldest first
+    open: np.ndarray    # float64
+    high: np.ndarray    # float64
+    low: np.ndarray     # float64
+    close: np.ndarray   # float64
+    volume: np.ndarray  # int64
+
+    def __len__(self):
+        return len(self.date)
+
+
+def ticker_seed(ticker: str) -> int:
+    """Stable 64-bit seed for a ticker (unlike ``hash()``, not salted per process)."""
+    return int.from_bytes(hashlib.md5(ticker.encode()).digest()[:8], "little")
+
+
+def _freeze(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+
+@lru_cache(maxsize=MARKET_CACHE_SIZE)
+def _build_series(ticker: str, days: int, anchor: date) -> MarketSeries:
+    # Another worker process may have generated it already
+    columns = shared_series.get("market", ticker, days, anchor)
+    if columns is not None:
+        return MarketSeries(**columns)
+    with timed("generate"):
+        series = _generate_series(ticker, days, anchor)
+    shared_series.put("market", ticker, days, anchor, series._asdict())
+    return series
+
+
+def _generate_series(ticker: str, days: int, anchor: date) -> MarketSeries:
+    start_date = anchor - timedelta(days=days)
+
+    # Same per-symbol shape parameters as the original loop-based generator
+    symbol_seed = sum(ord(char) for char in ticker)
+    base_price = 150 if ticker == "AAPL" else 100 + (symbol_seed % 200)
+    trend = (symbol_seed % 10) / 10
+    scale = 1 + (symbol_seed % 5) / 10
+
+    rng = np.random.default_rng([ticker_seed(ticker), days, anchor.toordinal()])
+    random_factor, close_noise, high_noise, low_noise, volume_noise = rng.random((5, days))
+
+    day_influence = np.arange(days) * (symbol_seed % 5) / 10
+    price_change = (random_factor * 10 - 5 + day_influence + trend) * scale
+
+    # price[i] = max(floor, price[i-1] + change[i]) is a walk reflected at the
+    # floor, which has the closed form S[i] + max(0, max_k<=i(floor - S[k]))
+    walk = base_price + np.cumsum(price_change)
+    open_price = walk + np.maximum(np.maximum.accumulate(PRICE_FLOOR - walk), 0)
+
+    close_price = open_price + (close_noise - 0.5) * 3
+    high_price = np.maximum(open_price, close_price) + high_noise * 2
+    low_price = np.minimum(open_price, close_price) - low_noise * 2
+    volume = (volume_noise * 1000000 * (1 + (symbol_seed % 3) / 5) + 500000).astype(np.int64)
+
+    dates = np.arange(
+        np.datetime64(start_date, "D"), np.datetime64(start_date, "D") + days
+    ).astype("U10")
+
+    return MarketSeries(
+        date=_freeze(dates),
+        open=_freeze(open_price),
+        high=_freeze(high_price),
+        low=_freeze(low_price),
+        close=_freeze(close_price),
+        volume=_freeze(volume),
+    )
+
+
+def get_market_series(ticker: str, days: int = 30, anchor: Optional[date] = None) -> MarketSeries:
+    """
+    Return the cached market series for ``ticker`` covering the ``days`` days
+    before ``anchor`` (today by default).
+    """
+    if anchor is None:
+        anchor = date.today()
+    return _build_series(ticker, days, anchor)
+
+
+def _publish_series(ticker: str, days: int, anchor: date):
+    """Generate a series into the shared cache; runs on the generation pool."""
+    _build_series(ticker, days, anchor)
+
+
+async def load_market_batch(tickers: List[str], days: int, anchor: Optional[date] = None) -> List[MarketSeries]:
+    """
+    ``get_market_series`` of several tickers for async callers. Series that
+    no worker has generated yet are generated on the generation pool when
+    there is one, then mapped from the shared cache. Either way the series
+    are built or mapped concurrently on the batch threads.
+    """
+    if anchor is None:
+        anchor = date.today()
+    if generation_pool() is not None:
+        missing = [ticker for ticker in tickers if not shared_series.contains("market", ticker, days, anchor)]
+        await asyncio.gather(*(run_in_generation_pool(_publish_series, ticker, days, anchor) for ticker in missing))
+    loop = asyncio.get_running_loop()
+    return list(await asyncio.gather(*(
+        loop.run_in_executor(batch_executor, get_market_series, ticker, days, anchor) for ticker in tickers
+    )))
+
+
+async def load_market_series(ticker: str, days: int = 30, anchor: Optional[date] = None) -> MarketSeries:
+    return (await load_market_batch([ticker], days, anchor))[0]
+
+
+def market_cache_info():
+    """Hit/miss statistics for the market series cache."""
+    return _build_series.cache_info()
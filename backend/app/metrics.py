@@ -0,0 +1,201 @@
+"""
+In-process metrics, exposed at ``/metrics`` in the Prometheus text format.
+
+* ``vibe_http_request_duration_seconds``  latency per route, method and status
+* ``vibe_http_stream_duration_seconds``   how long Server-Sent Events streams
+                                          stay open, kept apart so they do not
+                                          skew the request latencies
+* ``vibe_http_response_size_bytes``       body size per route
+* ``vibe_stage_duration_seconds``         time in each stage of building a
+                                          response: ``generate`` (mock data),
+                                          ``query`` (database), ``join``
+                                          (merging series) and ``serialize``
+
+Other modules contribute point-in-time values, such as cache statistics,
+through ``register_collector``. Recording is a bisect and a few additions
+under a lock; set ``METRICS_ENABLED=0`` to turn it off entirely.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+STREAM_BUCKETS = (1.0, 10.0, 60.0, 300.0, 900.0, 3600.0, 14400.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+Labels = Tuple[str, ...]
+# (name, type, help, [(labels, value)]) of one metric family
+Sample = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, labels: Labels, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(snapshot):
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels({**base, 'le': le})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(base)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(base)} {cumulative}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "vibe_http_request_duration_seconds", "Time to serve a request", ("route", "method", "status"), LATENCY_BUCKETS
+)
+STREAM_SECONDS = Histogram(
+    "vibe_http_stream_duration_seconds", "Time a streaming response stayed open", ("route",), STREAM_BUCKETS
+)
+RESPONSE_BYTES = Histogram("vibe_http_response_size_bytes", "Response body size", ("route",), SIZE_BUCKETS)
+STAGE_SECONDS = Histogram(
+    "vibe_stage_duration_seconds", "Time spent in each stage of building a response", ("stage",), LATENCY_BUCKETS
+)
+
+_collectors: List[Callable[[], Iterable[Sample]]] = []
+
+
+def register_collector(collector: Callable[[], Iterable[Sample]]):
+    """Add ``collector()``'s samples to every scrape."""
+    _collectors.append(collector)
+
+
+class _StageTimer:
+    __slots__ = ("labels", "started")
+
+    def __init__(self, stage: str):
+        self.labels = (stage,)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        STAGE_SECONDS.observe(self.labels, time.perf_counter() - self.started)
+
+
+class _NoTimer:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NO_TIMER = _NoTimer()
+
+
+def timed(stage: str):
+    """Context manager adding the time spent in its block to ``stage``."""
+    return _StageTimer(stage) if METRICS_ENABLED else _NO_TIMER
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for histogram in (REQUEST_SECONDS, STREAM_SECONDS, RESPONSE_BYTES, STAGE_SECONDS):
+        lines += histogram.render()
+    for collector in _collectors:
+        for name, kind, help, samples in collector():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            lines += [f"{name}{_format_labels(labels)} {value}" for labels, value in samples]
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    Records latency and body size of every HTTP request, labelled with the
+    matched route's path template so that IDs in paths do not each become a
+    series. Event streams are timed in ``STREAM_SECONDS`` instead.
+    """
+
+    def __init__(self, app: ASGIApp, routes: Optional[list] = None):
+        self.app = app
+        self.routes = routes if routes is not None else []
+        self._paths: Dict[Any, str] = {}
+
+    def _route(self, scope: Scope) -> str:
+        # The router leaves the matched endpoint in the scope it was given
+        endpoint = scope.get("endpoint")
+        if endpoint is not None:
+            path = self._paths.get(endpoint)
+            if path is None:
+                path = self._paths[endpoint] = next(
+                    (route.path for route in self.routes if getattr(route, "endpoint", None) is endpoint), "unmatched"
+                )
+            return path
+        # Answered before routing (a cache hit or preflight), so match by hand
+        for route in self.routes:
+            if route.matches(scope)[0] == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        size = 0
+        streaming = False
+
+        async def observe(message: Message):
+            nonlocal status, size, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                streaming = any(
+                    name.lower() == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in message.get("headers", [])
+                )
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, observe)
+        finally:
+            route = self._route(scope)
+            if streaming:
+                STREAM_SECONDS.observe((route,), time.perf_counter() - started)
+            else:
+                REQUEST_SECONDS.observe((route, scope["method"], str(status)), time.perf_counter() - started)
+            RESPONSE_BYTES.observe((route,), size)
@@ -0,0 +1,38 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class MarketData(BaseModel):
+    date: str
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: int
+
+class NewsItem(BaseModel):
+    id: int
+    title: str
+    source: str
+    date: str
+    sentiment: float
+    summary: str
+    url: Optional[str] = None
+
+class TimelineData(BaseModel):
+    date: str
+    price: float
+    volume: int
+    sentiment: float
+    newsCount: int
+    # The day's newest item
+    news: Optional[NewsItem] = None
+
+class BatchRequest(BaseModel):
+    symbols: List[str] = Field(..., min_items=1, max_items=500)
+    days: int = Field(30, ge=1, le=365)
+
+class CacheInvalidation(BaseModel):
+    # None drops every cached response
+    symbols: Optional[List[str]] = None
@@ -0,0 +1,369 @@
+"""
+Mock news store.
+
+News for a (symbol, day) is a pure function of its inputs, so each day is
+generated once and indexed. Item IDs are global and stable: they encode the
+symbol, the day and the item's position within that day, so the same article
+keeps its ID no matter which window it was first requested through.
+
+``MockNewsFeed`` stands in for a live source: it publishes a new item per
+symbol every ``MOCK_NEWS_INTERVAL`` seconds, dated the day it appears.
+"""
+
+import hashlib
+import math
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from app.metrics import timed
+from app.models import NewsItem
+
+NEWS_SOURCES = ["Bloomberg", "CNBC", "Financial Times", "Wall Street Journal", "Reuters"]
+
+# General market news that might affect any symbol
+MARKET_TITLES = [
+    "Federal Reserve Signals Potential Rate Hike",
+    "Inflation Concerns Weigh on Markets",
+    "Global Supply Chain Issues Begin to Ease",
+    "Economic Growth Exceeds Expectations",
+    "Market Volatility Increases Amid Geopolitical Tensions"
+]
+
+# ID layout (52 bits, safe as a JavaScript number):
+#   [ symbol hash : 32 | epoch day : 18 | index within day : 2 ]
+# Items published by the mock feed set bit 52 instead, still below 2**53:
+#   [ 1 | symbol hash : 32 | time slot : 20 ]
+_INDEX_BITS = 2
+_DAY_BITS = 18
+_DAY_MASK = (1 << _DAY_BITS) - 1
+_INDEX_MASK = (1 << _INDEX_BITS) - 1
+_EPOCH = date(1970, 1, 1)
+_SLOT_BITS = 20
+_SLOT_MASK = (1 << _SLOT_BITS) - 1
+_LIVE_FLAG = 1 << 52
+# Days an ID can encode; the store holds no news outside them
+FIRST_NEWS_DAY = _EPOCH
+LAST_NEWS_DAY = _EPOCH + timedelta(days=_DAY_MASK)
+
+# The API's longest window. IDs and date ranges reaching further back are
+# rejected rather than resolved, since every day between them and the
+# symbol's indexed span would have to be generated and kept
+MAX_LOOKBACK_DAYS = 365
+# Maximum number of symbols whose news is kept indexed
+NEWS_STORE_SYMBOLS = int(os.getenv("NEWS_STORE_SYMBOLS", "256"))
+# Seconds between the mock feed's items for each symbol
+MOCK_NEWS_INTERVAL = float(os.getenv("MOCK_NEWS_INTERVAL", "30"))
+
+
+def _md5_int(text: str) -> int:
+    return int(hashlib.md5(text.encode()).hexdigest(), 16)
+
+
+def symbol_hash(symbol: str) -> int:
+    return _md5_int(symbol) & 0xFFFFFFFF
+
+
+def make_news_id(symbol: str, day: date, index: int) -> int:
+    epoch_day = (day - _EPOCH).days
+    # A negative day would sign-extend over the symbol hash
+    if not 0 <= epoch_day <= _DAY_MASK:
+        raise ValueError(f"News IDs cannot encode {day.isoformat()}")
+    if not 0 <= index <= _INDEX_MASK:
+        raise ValueError(f"News IDs cannot encode item {index} of a day")
+    return (symbol_hash(symbol) << (_DAY_BITS + _INDEX_BITS)) | (epoch_day << _INDEX_BITS) | index
+
+
+def make_live_news_id(symbol: str, slot: int) -> int:
+    return _LIVE_FLAG | (symbol_hash(symbol) << _SLOT_BITS) | (slot & _SLOT_MASK)
+
+
+def split_news_id(news_id: int) -> Tuple[int, date, int]:
+    """Decode a news ID into (symbol hash, day, index within day)."""
+    index = news_id & _INDEX_MASK
+    epoch_day = (news_id >> _INDEX_BITS) & _DAY_MASK
+    return news_id >> (_DAY_BITS + _INDEX_BITS), _EPOCH + timedelta(days=epoch_day), index
+
+
+def _titles_for(symbol: str) -> Tuple[List[str], List[str], List[str]]:
+    symbol_name = symbol if symbol != "GENERAL" else "Markets"
+
+    positive_titles = [
+        f"{symbol_name} Surges on Strong Earnings Report",
+        f"Analysts Upgrade {symbol_name} Following Product Announcement",
+        f"{symbol_name} Gains as Sector Shows Growth",
+        f"New Partnership Boosts {symbol_name} Shares",
+        "Central Bank Signals Continued Support"
+    ]
+
+    negative_titles = [
+        f"{symbol_name} Drops After Missing Quarterly Expectations",
+        f"Regulatory Concerns Weigh on {symbol_name}",
+        f"{symbol_name} Falls as Competitors Gain Market Share",
+        "Federal Reserve Signals Potential Rate Hike",
+        "Retail Sales Decline for Second Consecutive Month"
+    ]
+
+    neutral_titles = [
+        f"{symbol_name} Holds Steady Ahead of Earnings",
+        f"Analysts Maintain Neutral Stance on {symbol_name}",
+        f"{symbol_name} Shows Mixed Signals in Volatile Market",
+        "Markets Mixed Ahead of Earnings Season",
+        "Oil Prices Stabilize Following Production Agreement"
+    ]
+
+    return positive_titles, negative_titles, neutral_titles
+
+
+def _make_item(
+    news_id: int, day: date, hash_value: int, titles: Tuple[List[str], List[str], List[str]]
+) -> NewsItem:
+    date_str = day.isoformat()
+    positive_titles, negative_titles, neutral_titles = titles
+    sentiment_base = (hash_value % 100) / 100.0  # 0.0 to 0.99
+    sentiment = (sentiment_base * 2 - 1)  # -1 to 1
+
+    # Select news title based on sentiment and hash
+    is_symbol_specific = (hash_value % 100) > 30  # 70% symbol-specific news
+
+    if not is_symbol_specific:
+        title = MARKET_TITLES[hash_value % len(MARKET_TITLES)]
+    elif sentiment > 0.3:
+        title = positive_titles[hash_value % len(positive_titles)]
+    elif sentiment < -0.3:
+        title = negative_titles[hash_value % len(negative_titles)]
+    else:
+        title = neutral_titles[hash_value % len(neutral_titles)]
+
+    return NewsItem(
+        id=news_id,
+        title=title,
+        source=NEWS_SOURCES[hash_value % len(NEWS_SOURCES)],
+        date=date_str,
+        sentiment=sentiment,
+        summary=f"This is a mock summary for the news item '{title}' on {date_str}."
+    )
+
+
+def generate_day(symbol: str, day: date) -> List[NewsItem]:
+    """Generate the (0-3) mock news items for one symbol and day."""
+    date_str = day.isoformat()
+    titles = _titles_for(symbol)
+
+    # Use a hash of the date and ticker to get a consistent number of news items
+    news_count = _md5_int(f"{date_str}_{symbol}") % 4
+
+    # Use a hash of the date, ticker, and news index to get consistent sentiment
+    return [
+        _make_item(make_news_id(symbol, day, j), day, _md5_int(f"{date_str}_{symbol}_{j}"), titles)
+        for j in range(news_count)
+    ]
+
+
+class MockNewsFeed:
+    """
+    Mock live news. Time is divided into ``interval``-second slots and each
+    symbol gets one item per slot, derived from the symbol and the slot, so
+    every worker process publishes the same item under the same ID.
+    """
+
+    def __init__(self, interval: float = MOCK_NEWS_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        # Symbol -> last slot polled; only the symbols of the latest poll are kept
+        self._polled: Dict[str, int] = {}
+
+    def item(self, symbol: str, slot: int) -> NewsItem:
+        day = datetime.fromtimestamp(slot * self.interval).date()
+        return _make_item(make_live_news_id(symbol, slot), day, _md5_int(f"live_{symbol}_{slot}"), _titles_for(symbol))
+
+    def poll(self, symbols: List[str]) -> List[Tuple[str, NewsItem]]:
+        """
+        Items published for ``symbols`` since the previous poll. A symbol's
+        first poll only starts its feed.
+        """
+        slot = int(time.time() // self.interval)
+        items = []
+        with self._lock:
+            polled, self._polled = self._polled, {}
+            for symbol in symbols:
+                if polled.get(symbol, slot) != slot:
+                    items.append((symbol, self.item(symbol, slot)))
+                self._polled[symbol] = slot
+        return items
+
+
+class NewsStore:
+    """
+    Indexed news items.
+
+    Only days between FIRST_NEWS_DAY and LAST_NEWS_DAY have news; requests
+    reaching outside them are clamped.
+
+    ``_items`` maps ID -> item and ``_by_day`` maps (symbol, ISO date) -> IDs in
+    publication order. Each symbol's generated days form one contiguous span,
+    which is extended at either end as requests reach further back or the
+    calendar rolls over, so no day is ever generated twice.
+
+    ``_keys`` holds each symbol's (ISO date, ID) pairs in sorted order, so
+    date-range queries are two bisections plus a slice.
+
+    At most ``max_symbols`` symbols are indexed; the least recently used one
+    is dropped to make room, along with any items added to it, and
+    regenerated if it is requested again.
+    """
+
+    def __init__(self, max_symbols: int = NEWS_STORE_SYMBOLS):
+        self._max_symbols = max_symbols
+        self._lock = threading.Lock()
+        self._items: Dict[int, NewsItem] = {}
+        self._by_day: Dict[Tuple[str, str], List[int]] = {}
+        self._span: "OrderedDict[str, Tuple[date, date]]" = OrderedDict()
+        self._symbols: Dict[int, str] = {}
+        self._keys: Dict[str, List[Tuple[str, int]]] = {}
+
+    def _add_days(self, symbol: str, start: date, end: date) -> List[Tuple[str, int]]:
+        keys = []
+        day = start
+        with timed("generate"):
+            while day <= end:
+                date_str = day.isoformat()
+                items = generate_day(symbol, day)
+                for item in items:
+                    self._items[item.id] = item
+                    keys.append((date_str, item.id))
+                self._by_day[(symbol, date_str)] = [item.id for item in items]
+                day += timedelta(days=1)
+        return keys
+
+    def _evict(self, symbol: str):
+        lo, hi = self._span.pop(symbol)
+        for _, news_id in self._keys.pop(symbol):
+            del self._items[news_id]
+        day = lo
+        while day <= hi:
+            del self._by_day[(symbol, day.isoformat())]
+            day += timedelta(days=1)
+        if self._symbols.get(symbol_hash(symbol)) == symbol:
+            del self._symbols[symbol_hash(symbol)]
+
+    def _ensure(self, symbol: str, first: date, last: date) -> List[Tuple[str, int]]:
+        """Index [first, last] for ``symbol`` and return its keys; call with the lock held."""
+        keys = self._keys.setdefault(symbol, [])
+        first, last = max(first, FIRST_NEWS_DAY), min(last, LAST_NEWS_DAY)
+        span = self._span.get(symbol)
+        if span is None:
+            if last < first:
+                # Nothing to index; do not track the symbol
+                del self._keys[symbol]
+                return keys
+            keys.extend(self._add_days(symbol, first, last))
+            span = (first, last)
+            self._symbols[symbol_hash(symbol)] = symbol
+        elif first <= last:
+            lo, hi = span
+            # Keep the span contiguous even if the request skipped a gap
+            if first < lo:
+                keys[:0] = self._add_days(symbol, first, lo - timedelta(days=1))
+            if last > hi:
+                keys.extend(self._add_days(symbol, hi + timedelta(days=1), last))
+            span = (min(first, lo), max(last, hi))
+        self._span[symbol] = span
+        self._span.move_to_end(symbol)
+        while len(self._span) > self._max_symbols:
+            self._evict(next(iter(self._span)))
+        return keys
+
+    def ensure(self, symbol: str, first: date, last: date):
+        """Make sure every day in [first, last] is indexed for ``symbol``."""
+        with self._lock:
+            self._ensure(symbol, first, last)
+
+    def get(self, news_id: int, symbol: Optional[str] = None) -> Optional[NewsItem]:
+        item = self._items.get(news_id)
+        if item is None and 0 < news_id < _LIVE_FLAG:
+            # IDs are self-describing, so an item from a day that hasn't been
+            # requested yet can still be resolved once its symbol is known
+            hashed, day, _ = split_news_id(news_id)
+            if symbol is None or symbol_hash(symbol) != hashed:
+                symbol = self._symbols.get(hashed)
+            if symbol is not None and date.today() - timedelta(days=MAX_LOOKBACK_DAYS) <= day <= date.today():
+                with self._lock:
+                    self._ensure(symbol, day, day)
+                    item = self._items.get(news_id)
+        return item
+
+    def for_day(self, symbol: str, day: date) -> List[NewsItem]:
+        with self._lock:
+            self._ensure(symbol, day, day)
+            return [self._items[news_id] for news_id in self._by_day.get((symbol, day.isoformat()), [])]
+
+    def add(self, symbol: str, item: NewsItem) -> bool:
+        """
+        Index an item published after its day was generated. Returns False if
+        the ID is already known.
+        """
+        day = date.fromisoformat(item.date)
+        with self._lock:
+            keys = self._ensure(symbol, day, day)
+            if item.id in self._items:
+                return False
+            self._items[item.id] = item
+            self._by_day[(symbol, item.date)].append(item.id)
+            insort(keys, (item.date, item.id))
+            return True
+
+    def between(self, symbol: str, first: date, last: date) -> List[NewsItem]:
+        """News dated within [first, last], oldest first."""
+        with self._lock:
+            keys = self._ensure(symbol, first, last)
+            lo = bisect_left(keys, (first.isoformat(),))
+            hi = bisect_right(keys, (last.isoformat(), math.inf))
+            return [self._items[news_id] for _, news_id in keys[lo:hi]]
+
+    def window(self, symbol: str, days: int, anchor: Optional[date] = None) -> List[NewsItem]:
+        """News for the ``days`` days before ``anchor``, newest first."""
+        if anchor is None:
+            anchor = date.today()
+        first, last = anchor - timedelta(days=days), anchor - timedelta(days=1)
+        return self.date_range(symbol, first, last)[0]
+
+    def date_range(
+        self,
+        symbol: str,
+        first: date,
+        last: date,
+        limit: Optional[int] = None,
+        cursor: Optional[int] = None,
+    ) -> Tuple[List[NewsItem], Optional[int]]:
+        """
+        News dated within [first, last], newest first.
+
+        Returns at most ``limit`` items plus the cursor for the next page (the
+        ID of the last item returned), or ``None`` when the range is exhausted.
+        Pass that cursor back to continue after it. Raises ``KeyError`` for a
+        cursor that is not an item of ``symbol``.
+        """
+        with self._lock:
+            keys = self._ensure(symbol, first, last)
+
+            lo = bisect_left(keys, (first.isoformat(),))
+            hi = bisect_right(keys, (last.isoformat(), math.inf))
+            if cursor is not None:
+                item = self._items.get(cursor)
+                position = bisect_left(keys, (item.date, cursor)) if item is not None else len(keys)
+                if position >= len(keys) or keys[position][1] != cursor:
+                    raise KeyError(cursor)
+                hi = min(hi, position)
+
+            start = lo if limit is None else max(lo, hi - limit)
+            page = [self._items[news_id] for _, news_id in reversed(keys[start:hi])]
+        next_cursor = page[-1].id if page and start > lo else None
+        return page, next_cursor
+
+
+news_store = NewsStore()
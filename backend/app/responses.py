@@ -0,0 +1,158 @@
+"""
+Fast-path response helpers.
+
+Data generated by the server itself is already well-formed, so these helpers
+encode it straight to JSON with orjson instead of building, validating and
+re-serialising one pydantic model per row. Routes keep their
+``response_model`` for the OpenAPI schema; returning a ``Response`` directly
+makes FastAPI skip response validation.
+
+Series routes also speak a packed binary layout, chosen by sending
+``Accept: application/vnd.vibe.columns``. All integers are little-endian::
+
+    header   b"VIBC"  uint16 version (1)  uint16 column count  uint32 row count
+             uint32 zero
+    column   uint8 type  uint8 name length  name (UTF-8)  zero padding to a
+             multiple of 8 bytes  uint32 payload bytes  uint32 zero
+             payload, then zero padding to a multiple of 8 bytes
+
+Every payload starts 8-byte aligned, so a client can view it in place as a
+typed array. Column types:
+
+    D  int32 days since 1970-01-01 (dates)
+    f  float32
+    q  int64
+    j  UTF-8 JSON array (values that are not numbers, e.g. timeline news)
+
+Columns are contiguous runs of one numeric type, so the payload is several
+times smaller than JSON and still compresses well.
+"""
+
+import struct
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+import orjson
+from fastapi.responses import ORJSONResponse, Response
+
+from app.metrics import timed
+
+
+class ResponseFormat(str, Enum):
+    rows = "rows"          # [{"date": ..., "open": ...}, ...] (default)
+    columnar = "columnar"  # {"date": [...], "open": [...], ...}
+
+
+Columns = Mapping[str, Sequence[Any]]
+
+
+def as_list(values: Sequence[Any]) -> List[Any]:
+    # orjson only understands numeric NumPy dtypes, so unicode date arrays
+    # (and everything else) go out as plain Python lists
+    if isinstance(values, np.ndarray):
+        return values.tolist()
+    return list(values)
+
+
+def columns_from_items(items: Iterable[Any], fields: Sequence[str]) -> Dict[str, List[Any]]:
+    """Transpose model instances (or plain objects) into per-field lists."""
+    columns: Dict[str, List[Any]] = {field: [] for field in fields}
+    for item in items:
+        for field in fields:
+            value = getattr(item, field)
+            if hasattr(value, "dict"):
+                value = value.dict()
+            columns[field].append(value)
+    return columns
+
+
+def rows_from_columns(columns: Columns) -> List[Dict[str, Any]]:
+    """Zip columns back into row dictionaries."""
+    names = list(columns)
+    values = [as_list(columns[name]) for name in names]
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+
+BINARY_MEDIA_TYPE = "application/vnd.vibe.columns"
+
+_MAGIC = b"VIBC"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHHII")
+_PAYLOAD = struct.Struct("<II")
+
+
+def _pad(length: int) -> bytes:
+    return b"\0" * (-length % 8)
+
+
+def _packed_column(values: Sequence[Any]):
+    """The type code and payload of one column"""
+    array = values if isinstance(values, np.ndarray) else np.asarray(values)
+    if array.dtype.kind == "U":
+        return b"D", array.astype("datetime64[D]").astype("<i4").tobytes()
+    if array.dtype.kind == "f":
+        return b"f", array.astype("<f4").tobytes()
+    if array.dtype.kind in "iub":
+        return b"q", array.astype("<i8").tobytes()
+    return b"j", orjson.dumps(as_list(values))
+
+
+def encode_columns(columns: Columns) -> bytes:
+    """Pack columnar data in the binary layout described above."""
+    names = list(columns)
+    rows = len(columns[names[0]]) if names else 0
+    parts = [_HEADER.pack(_MAGIC, _VERSION, len(names), rows, 0)]
+    for name in names:
+        code, payload = _packed_column(columns[name])
+        label = code + bytes([len(name.encode())]) + name.encode()
+        parts += [label, _pad(len(label)), _PAYLOAD.pack(len(payload), 0), payload, _pad(len(payload))]
+    return b"".join(parts)
+
+
+def decode_columns(data: bytes) -> Dict[str, Any]:
+    """Unpack ``encode_columns`` output; dates come back as ISO strings."""
+    magic, version, count, rows, _ = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError("Not a version 1 packed column payload")
+    columns: Dict[str, Any] = {}
+    offset = _HEADER.size
+    for _ in range(count):
+        code, length = data[offset:offset + 1], data[offset + 1]
+        name = data[offset + 2:offset + 2 + length].decode()
+        offset += 2 + length
+        offset += -offset % 8
+        size, _ = _PAYLOAD.unpack_from(data, offset)
+        offset += _PAYLOAD.size
+        payload = data[offset:offset + size]
+        offset += size + (-size % 8)
+        if code == b"D":
+            columns[name] = np.frombuffer(payload, "<i4").astype("datetime64[D]").astype(str)
+        elif code == b"f":
+            columns[name] = np.frombuffer(payload, "<f4")
+        elif code == b"q":
+            columns[name] = np.frombuffer(payload, "<i8")
+        else:
+            columns[name] = orjson.loads(payload)
+    return columns
+
+
+def wants_binary(accept: Optional[str]) -> bool:
+    return bool(accept) and BINARY_MEDIA_TYPE in accept
+
+
+def series_response(
+    columns: Columns, fmt: ResponseFormat = ResponseFormat.rows, accept: Optional[str] = None
+) -> Response:
+    """
+    Encode columnar data in the requested format, bypassing pydantic. An
+    ``Accept`` header asking for BINARY_MEDIA_TYPE takes precedence over ``fmt``.
+    """
+    # The representation depends on Accept, so shared caches must key on it too
+    headers = {"Vary": "Accept"}
+    with timed("serialize"):
+        if wants_binary(accept):
+            return Response(encode_columns(columns), media_type=BINARY_MEDIA_TYPE, headers=headers)
+        if fmt == ResponseFormat.columnar:
+            return ORJSONResponse({name: as_list(values) for name, values in columns.items()}, headers=headers)
+        return ORJSONResponse(rows_from_columns(columns), headers=headers)
@@ -0,0 +1,279 @@
+"""
+Series cache shared by every worker process on the host.
+
+Each entry is one file in ``SHARED_CACHE_DIR``, named after its
+(kind, date, symbol, days) key and written once under a temporary name then
+renamed into place, so readers only ever see complete files. A file holds a
+small JSON manifest followed by each column's raw buffer, 64-byte aligned:
+
+    b"VSC1" | uint32 manifest length | manifest | pad | column buffers
+
+Readers memory-map the file and wrap the buffers with ``np.frombuffer``, so
+looking up a series another worker built costs a stat, an open and a parse
+of the manifest; the arrays themselves are read-only views of pages shared
+through the OS page cache. Columns that are not NumPy arrays are stored as
+JSON.
+
+``/dev/shm`` keeps the files in memory. Each worker tracks the directory's
+size from its last listing plus what it has written since, and lists it
+again when a new date starts or that estimate exceeds
+``SHARED_CACHE_MAX_BYTES``; entries of past dates are then removed, as are
+the oldest entries until the directory fits. An empty ``SHARED_CACHE_DIR``
+disables the cache. Any error replacing or removing an entry (Windows
+refuses both while another worker has the file mapped) leaves the cache
+as it was: the series is simply not shared.
+
+The directory also carries response cache invalidations between workers:
+each is appended as one JSON line to ``.invalidations``, which every worker
+polls for lines written by the others. Once the log exceeds
+``SHARED_CACHE_LOG_BYTES`` it is replaced by an empty one; a worker that
+notices the replacement cannot know what it missed, so it drops every
+cached response.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from datetime import date
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+import orjson
+
+# Directory of shared entries; empty disables the cache
+SHARED_CACHE_DIR = os.getenv("SHARED_CACHE_DIR", "")
+# Upper bound on the bytes of all entries together
+SHARED_CACHE_MAX_BYTES = int(os.getenv("SHARED_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Size past which the invalidation log is started afresh
+SHARED_CACHE_LOG_BYTES = int(os.getenv("SHARED_CACHE_LOG_BYTES", str(1024 * 1024)))
+# Seconds between checks for invalidations published by other workers
+SHARED_CACHE_POLL_SECONDS = float(os.getenv("SHARED_CACHE_POLL_SECONDS", "1"))
+
+_MAGIC = b"VSC1"
+_HEADER = struct.Struct("<4sI")
+_ALIGN = 64
+
+
+def _pad(length: int) -> bytes:
+    return b"\0" * (-length % _ALIGN)
+
+
+def encode_series(columns: Mapping[str, Any]) -> bytes:
+    buffers = []
+    manifest = []
+    for name, values in columns.items():
+        if isinstance(values, np.ndarray):
+            data = np.ascontiguousarray(values).tobytes()
+            manifest.append([name, values.dtype.str, len(values), len(data)])
+        else:
+            data = orjson.dumps(values)
+            manifest.append([name, "json", len(values), len(data)])
+        buffers.append(data)
+    header = orjson.dumps(manifest)
+    parts = [_HEADER.pack(_MAGIC, len(header)), header, _pad(_HEADER.size + len(header))]
+    for data in buffers:
+        parts += [data, _pad(len(data))]
+    return b"".join(parts)
+
+
+def decode_series(buffer) -> Dict[str, Any]:
+    """Columns of an ``encode_series`` buffer; arrays are views of ``buffer``."""
+    magic, length = _HEADER.unpack_from(buffer)
+    if magic != _MAGIC:
+        raise ValueError("Not a shared series entry")
+    offset = _HEADER.size + length
+    offset += -offset % _ALIGN
+    columns: Dict[str, Any] = {}
+    for name, dtype, count, size in orjson.loads(buffer[_HEADER.size:_HEADER.size + length]):
+        if dtype == "json":
+            columns[name] = orjson.loads(buffer[offset:offset + size])
+        else:
+            columns[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+        offset += size + (-size % _ALIGN)
+    return columns
+
+
+def _remove(path: str) -> bool:
+    """Delete ``path``; False if it is still there (on Windows, while mapped)."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class SharedSeriesCache:
+    def __init__(
+        self,
+        directory: str = SHARED_CACHE_DIR,
+        max_bytes: int = SHARED_CACHE_MAX_BYTES,
+        log_bytes: int = SHARED_CACHE_LOG_BYTES,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.log_bytes = log_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        # Directory size at the last listing plus bytes written since, and
+        # the date that listing kept
+        self._bytes = 0
+        self._anchor: Optional[date] = None
+        # (device, inode) of the invalidation log and the offset read up to
+        self._log_id: Optional[Tuple[int, int]] = None
+        self._invalidations_read = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            # Invalidations from before this worker started concern no response it has
+            try:
+                stat = os.stat(self._invalidations_path)
+            except FileNotFoundError:
+                pass
+            else:
+                self._log_id = (stat.st_dev, stat.st_ino)
+                self._invalidations_read = stat.st_size
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def path(self, kind: str, symbol: str, days: int, anchor: date) -> str:
+        # Symbols are user input; hash them rather than trust them in a file name
+        digest = hashlib.blake2b(symbol.encode(), digest_size=8).hexdigest()
+        return os.path.join(self.directory, f"{kind}-{anchor.isoformat()}-{digest}-{days}.bin")
+
+    def contains(self, kind: str, symbol: str, days: int, anchor: date) -> bool:
+        return self.enabled and os.path.exists(self.path(kind, symbol, days, anchor))
+
+    def get(self, kind: str, symbol: str, days: int, anchor: date) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        try:
+            with open(self.path(kind, symbol, days, anchor), "rb") as f:
+                # The mapping outlives the descriptor and is kept alive by the arrays
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # ValueError: an empty file cannot be mapped
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return decode_series(mapped)
+
+    def put(self, kind: str, symbol: str, days: int, anchor: date, columns: Mapping[str, Any]):
+        if not self.enabled:
+            return
+        path = self.path(kind, symbol, days, anchor)
+        tmp_path = os.path.join(self.directory, f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}")
+        data = encode_series(columns)
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            # Typically the entry is mapped by another worker on Windows
+            _remove(tmp_path)
+            return
+        with self._lock:
+            self.writes += 1
+            self._bytes += len(data)
+            if self._anchor is not None and anchor <= self._anchor and self._bytes <= self.max_bytes:
+                return
+            if self._anchor is None or anchor > self._anchor:
+                self._anchor = anchor
+            keep = self._anchor
+        self._trim(keep)
+
+    def _trim(self, anchor: date):
+        """Drop entries of other dates, then the oldest until under max_bytes."""
+        entries = []
+        total = 0
+        today = f"-{anchor.isoformat()}-"
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.startswith("."):
+                    continue
+                if today not in entry.name and _remove(entry.path):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # Removed by another worker meanwhile
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if _remove(path):
+                total -= size
+        with self._lock:
+            self._bytes = total
+
+    @property
+    def _invalidations_path(self) -> str:
+        return os.path.join(self.directory, ".invalidations")
+
+    def publish_invalidation(self, symbols: Optional[List[str]]):
+        """Have the other workers drop their cached responses for ``symbols`` (None for all)."""
+        if not self.enabled:
+            return
+        line = orjson.dumps({"pid": os.getpid(), "symbols": symbols}) + b"\n"
+        # One small O_APPEND write, so lines from concurrent workers never interleave
+        fd = os.open(self._invalidations_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if size > self.log_bytes:
+            self._rotate_invalidations()
+
+    def _rotate_invalidations(self):
+        tmp_path = f"{self._invalidations_path}.{os.getpid()}.{threading.get_ident()}"
+        try:
+            open(tmp_path, "wb").close()
+            os.replace(tmp_path, self._invalidations_path)
+        except OSError:
+            # Open in another worker on Windows; rotate on a later publish
+            _remove(tmp_path)
+
+    def read_invalidations(self) -> List[Optional[List[str]]]:
+        """Symbol lists invalidated by other workers since the last call."""
+        if not self.enabled:
+            return []
+        try:
+            with open(self._invalidations_path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                log_id = (stat.st_dev, stat.st_ino)
+                invalidated: List[Optional[List[str]]] = []
+                if log_id != self._log_id:
+                    if self._log_id is not None:
+                        # Rotated: lines written to the old log since the last call are lost
+                        invalidated.append(None)
+                    self._log_id = log_id
+                    self._invalidations_read = 0
+                if stat.st_size <= self._invalidations_read:
+                    return invalidated
+                f.seek(self._invalidations_read)
+                data = f.read(stat.st_size - self._invalidations_read)
+        except FileNotFoundError:
+            return []
+        # Leave a line still being written for the next call
+        complete = data[:data.rfind(b"\n") + 1]
+        self._invalidations_read += len(complete)
+        entries = [orjson.loads(line) for line in complete.splitlines()]
+        return invalidated + [entry["symbols"] for entry in entries if entry["pid"] != os.getpid()]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"enabled": self.enabled, "hits": self.hits, "misses": self.misses, "writes": self.writes}
+
+
+shared_series = SharedSeriesCache()
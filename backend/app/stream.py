@@ -0,0 +1,178 @@
+"""
+Server-Sent Events push of timeline updates.
+
+Clients subscribe to a set of symbols for a given window. They first receive a
+``snapshot`` event per symbol, then only deltas:
+
+* ``news``       a newly published NewsItem
+* ``sentiment``  the updated daily sentiment and news count for that item's day
+* ``snapshot``   a full window again when the calendar day rolls over (the
+                 mock market walk is anchored to the window, so a new day
+                 restates the whole series rather than appending one bar)
+
+A single producer polls the data source every ``STREAM_POLL_SECONDS`` for
+news published since the previous poll (``DataSource.news_updates``),
+encodes each event once and fans the same bytes out to every subscriber of
+the topic, so the per-client cost is just the send. A
+subscriber that falls ``STREAM_QUEUE_SIZE`` events behind is disconnected;
+``EventSource`` reconnects and resynchronises from a fresh snapshot.
+"""
+
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import date
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import orjson
+from starlette.requests import Request
+
+from app.responses import as_list
+from app.datasource import DataSource
+from app.timeline import NewsUpdate
+
+logger = logging.getLogger(__name__)
+
+# Seconds between producer polls for new news and day rollover
+STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", "5"))
+# Most news items published per poll; older ones in a burst are skipped
+STREAM_NEWS_LIMIT = int(os.getenv("STREAM_NEWS_LIMIT", "100"))
+# Seconds of silence after which a keep-alive comment is sent
+STREAM_KEEPALIVE_SECONDS = float(os.getenv("STREAM_KEEPALIVE_SECONDS", "15"))
+# Events buffered per subscriber before it is dropped as too slow
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "256"))
+
+Topic = Tuple[str, int]  # (symbol, days)
+
+
+def encode_event(name: str, data: Any) -> bytes:
+    return b"event: " + name.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+class Subscriber:
+    def __init__(self, symbols: List[str], days: int):
+        self.symbols = symbols
+        self.days = days
+        self.queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+
+    @property
+    def topics(self) -> List[Topic]:
+        return [(symbol, self.days) for symbol in self.symbols]
+
+
+class StreamHub:
+    """
+    Fans out snapshots and deltas read from ``source``, so they match what
+    ``/api/timeline`` serves.
+    """
+
+    def __init__(self, source: DataSource):
+        self._source = source
+        self._topics: Dict[Topic, Set[Subscriber]] = defaultdict(set)
+        self._producer: Optional[asyncio.Task] = None
+        self._anchor = date.today()
+
+    async def start(self):
+        self._producer = asyncio.create_task(self._produce())
+
+    async def stop(self):
+        if self._producer is not None:
+            self._producer.cancel()
+            self._producer = None
+
+    def subscribe(self, symbols: List[str], days: int) -> Subscriber:
+        subscriber = Subscriber(symbols, days)
+        for topic in subscriber.topics:
+            self._topics[topic].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        for topic in subscriber.topics:
+            subscribers = self._topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._topics[topic]
+
+    def _send(self, subscriber: Subscriber, event: Optional[bytes]):
+        try:
+            subscriber.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning("Dropping slow stream subscriber for %s", ",".join(subscriber.symbols))
+            self.unsubscribe(subscriber)
+            # Make room for the sentinel that ends its response
+            subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(None)
+
+    def publish(self, topics: List[Topic], event: bytes):
+        """Fan one encoded event out to every subscriber of ``topics``."""
+        for topic in topics:
+            for subscriber in list(self._topics.get(topic, ())):
+                self._send(subscriber, event)
+
+    def _publish_update(self, update: NewsUpdate):
+        topics = [topic for topic in self._topics if topic[0] == update.symbol]
+        self.publish(topics, encode_event("news", {"symbol": update.symbol, "news": update.item.dict()}))
+        if update.day is not None:
+            count, mean = update.day
+            self.publish(topics, encode_event("sentiment", {
+                "symbol": update.symbol,
+                "date": update.item.date,
+                "sentiment": mean,
+                "newsCount": count,
+            }))
+
+    async def snapshot(self, symbol: str, days: int) -> bytes:
+        series = await self._source.timeline(symbol, days)
+        data: Dict[str, Any] = {"symbol": symbol}
+        data.update((name, as_list(values)) for name, values in series._asdict().items())
+        return encode_event("snapshot", data)
+
+    async def _roll_over(self):
+        today = date.today()
+        if today == self._anchor:
+            return
+        self._anchor = today
+        for topic in list(self._topics):
+            try:
+                event = await self.snapshot(*topic)
+            except Exception:
+                logger.exception("Failed to build stream snapshot for %s", topic)
+                continue
+            self.publish([topic], event)
+
+    async def _poll_news(self):
+        symbols = sorted({symbol for symbol, _ in self._topics})
+        try:
+            updates = await self._source.news_updates(symbols, STREAM_NEWS_LIMIT)
+        except Exception:
+            logger.exception("Failed to poll news for the stream")
+            return
+        for update in updates:
+            self._publish_update(update)
+
+    async def _produce(self):
+        while True:
+            await asyncio.sleep(STREAM_POLL_SECONDS)
+            await self._roll_over()
+            await self._poll_news()
+
+    async def events(self, subscriber: Subscriber, request: Request) -> AsyncIterator[bytes]:
+        """The SSE body for one subscriber: snapshots, then queued deltas."""
+        try:
+            for symbol in subscriber.symbols:
+                yield await self.snapshot(symbol, subscriber.days)
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield b": keep-alive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield event
+        finally:
+            self.unsubscribe(subscriber)
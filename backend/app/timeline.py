@@ -0,0 +1,234 @@
+"""
+Timeline engine.
+
+Joins market bars with per-day news aggregates. Daily sentiment is kept as
+running (count, sum, latest item) aggregates per symbol and date, computed
+once per day from the news store and updated as news arrives, so neither a
+new request nor a new article ever regroups the whole window. Each row's
+``news`` is the day's newest item, as with the database rollups; the
+original generator returned the first.
+
+Assembled timelines are cached per (symbol, days, anchor date). Windows end
+the day before their anchor while live news is dated the day it appears, so
+a cached timeline never covers a new item's day; one that does (an item
+from just before midnight) is dropped rather than patched. Aggregates are
+kept for the ``NEWS_STORE_SYMBOLS`` most recently used symbols.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.market import MarketSeries, get_market_series
+from app.metrics import timed
+from app.models import NewsItem
+from app.news import NEWS_STORE_SYMBOLS, NewsStore, news_store
+
+# Maximum number of assembled (symbol, days, anchor) timelines kept in memory
+TIMELINE_CACHE_SIZE = int(os.getenv("TIMELINE_CACHE_SIZE", "1024"))
+
+
+class DayAggregate:
+    """Running news statistics for one symbol and day."""
+    __slots__ = ("count", "total", "latest")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.latest: Optional[NewsItem] = None
+
+    def add(self, item: NewsItem):
+        self.count += 1
+        self.total += item.sentiment
+        # Items arrive in publication order, so the last one is the newest
+        self.latest = item
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class TimelineSeries(NamedTuple):
+    """One row per trading day, as parallel columns."""
+    date: np.ndarray                      # '<U10', shared with the market series
+    price: np.ndarray                     # float64, shared with the market series
+    volume: np.ndarray                    # int64, shared with the market series
+    sentiment: np.ndarray                 # float64
+    newsCount: np.ndarray                 # int64
+    news: List[Optional[Dict[str, Any]]]  # newest item of the day, as a dict
+
+    def __len__(self):
+        return len(self.date)
+
+
+# Per-day (news count, mean sentiment, newest item as a dict), keyed by ISO date
+DailyNews = Mapping[str, Tuple[int, float, Optional[Dict[str, Any]]]]
+
+
+def assemble_timeline(market: MarketSeries, daily: DailyNews) -> TimelineSeries:
+    """Join market bars with per-day news statistics in one pass over the days."""
+    days = len(market)
+    sentiment = np.zeros(days)
+    news_count = np.zeros(days, dtype=np.int64)
+    news: List[Optional[Dict[str, Any]]] = [None] * days
+    with timed("join"):
+        for i, date_str in enumerate(market.date.tolist()):
+            stats = daily.get(date_str)
+            if stats is not None:
+                news_count[i], sentiment[i], news[i] = stats
+
+    return TimelineSeries(
+        date=market.date,
+        price=market.close,
+        volume=market.volume,
+        sentiment=sentiment,
+        newsCount=news_count,
+        news=news,
+    )
+
+
+class NewsUpdate(NamedTuple):
+    """A newly recorded item and its day's statistics including it."""
+    symbol: str
+    item: NewsItem
+    day: Optional[Tuple[int, float]]  # (news count, mean sentiment); None if not aggregated
+
+
+NewsListener = Callable[[str, NewsItem, Optional[DayAggregate]], None]
+
+
+class TimelineEngine:
+    def __init__(self, store: NewsStore, max_entries: int = TIMELINE_CACHE_SIZE, max_symbols: int = NEWS_STORE_SYMBOLS):
+        self._store = store
+        self._max_entries = max_entries
+        self._max_symbols = max_symbols
+        self._lock = threading.RLock()
+        self._daily: Dict[str, Dict[str, DayAggregate]] = {}
+        self._span: "OrderedDict[str, Tuple[date, date]]" = OrderedDict()
+        self._cache: "OrderedDict[Tuple[str, int, date], TimelineSeries]" = OrderedDict()
+        self._listeners: List[NewsListener] = []
+        self.hits = 0
+        self.misses = 0
+
+    def add_listener(self, listener: "NewsListener"):
+        """Call ``listener(symbol, item, aggregate)`` for every item passed to add_news."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: "NewsListener"):
+        self._listeners.remove(listener)
+
+    def _aggregate(self, symbol: str, first: date, last: date):
+        daily = self._daily.setdefault(symbol, {})
+        for item in self._store.between(symbol, first, last):
+            aggregate = daily.get(item.date)
+            if aggregate is None:
+                aggregate = daily[item.date] = DayAggregate()
+            aggregate.add(item)
+
+    def _ensure_aggregates(self, symbol: str, first: date, last: date):
+        # Like the news store, aggregated days form one contiguous span per
+        # symbol and only the days outside it are ever aggregated
+        span = self._span.get(symbol)
+        if span is None:
+            self._aggregate(symbol, first, last)
+            span = (first, last)
+        else:
+            lo, hi = span
+            if first < lo:
+                self._aggregate(symbol, first, lo - timedelta(days=1))
+            if last > hi:
+                self._aggregate(symbol, hi + timedelta(days=1), last)
+            span = (min(first, lo), max(last, hi))
+        self._span[symbol] = span
+        self._span.move_to_end(symbol)
+        while len(self._span) > self._max_symbols:
+            self._evict(next(iter(self._span)))
+
+    def _evict(self, symbol: str):
+        del self._span[symbol]
+        del self._daily[symbol]
+        # Their days' news would no longer be tracked
+        for key in [key for key in self._cache if key[0] == symbol]:
+            del self._cache[key]
+
+    def _build(self, symbol: str, days: int, anchor: date) -> TimelineSeries:
+        market = get_market_series(symbol, days, anchor)
+        self._ensure_aggregates(symbol, anchor - timedelta(days=days), anchor - timedelta(days=1))
+        daily = self._daily[symbol]
+        return assemble_timeline(market, {
+            date_str: (aggregate.count, aggregate.mean, aggregate.latest.dict())
+            for date_str in market.date.tolist()
+            for aggregate in (daily.get(date_str),) if aggregate is not None
+        })
+
+    def timeline(self, symbol: str, days: int = 30, anchor: Optional[date] = None) -> TimelineSeries:
+        if anchor is None:
+            anchor = date.today()
+        key = (symbol, days, anchor)
+        with self._lock:
+            series = self._cache.get(key)
+            if series is not None:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return series
+
+            self.misses += 1
+            series = self._cache[key] = self._build(symbol, days, anchor)
+            if len(self._cache) > self._max_entries:
+                self._cache.popitem(last=False)
+            return series
+
+    def cache_info(self) -> Dict[str, int]:
+        """Hit/miss statistics for the assembled timeline cache."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._cache)}
+
+    def add_news(self, symbol: str, item: NewsItem) -> Optional[NewsUpdate]:
+        """
+        Record a newly published item, updating its day's aggregate and
+        dropping any cached timeline that covers the day. Returns None if the
+        item was already known.
+        """
+        # Under the engine lock, so a concurrent timeline() cannot aggregate
+        # the day from the store after the insert and before the update
+        with self._lock:
+            if symbol in self._span:
+                # Aggregate the item's day, if it is new, before the item is
+                # in the store; the update below then adds it exactly once
+                item_day = date.fromisoformat(item.date)
+                self._ensure_aggregates(symbol, item_day, item_day)
+            if not self._store.add(symbol, item):
+                return None
+            aggregate = self._update_aggregate(symbol, item)
+            update = NewsUpdate(symbol, item, (aggregate.count, aggregate.mean) if aggregate is not None else None)
+        for listener in list(self._listeners):
+            listener(symbol, item, aggregate)
+        return update
+
+    def _update_aggregate(self, symbol: str, item: NewsItem) -> Optional[DayAggregate]:
+        span = self._span.get(symbol)
+        item_day = date.fromisoformat(item.date)
+        if span is None or not span[0] <= item_day <= span[1]:
+            # Not aggregated yet; it will be picked up from the store
+            return None
+
+        daily = self._daily[symbol]
+        aggregate = daily.get(item.date)
+        if aggregate is None:
+            aggregate = daily[item.date] = DayAggregate()
+        aggregate.add(item)
+
+        stale = [
+            key for key in self._cache
+            if key[0] == symbol and 0 < (key[2] - item_day).days <= key[1]
+        ]
+        for key in stale:
+            del self._cache[key]
+        return aggregate
+
+
+timeline_engine = TimelineEngine(news_store)
@@ -0,0 +1,231 @@
+"""
+Latency and throughput of the API routes, measured in-process.
+
+Run from the backend directory:
+
+    python -m benchmarks.api [--output results.json] [--baseline baseline.json]
+
+Requests go straight to the ASGI app (no sockets or HTTP client), so the
+numbers are the cost of the routes themselves. Every route is driven at
+several ``days`` values and concurrency levels; each case reports p50, p95
+and p99 latency and requests per second. The response cache is bypassed
+unless ``--cache`` is given, so a case measures the data path rather than
+cache hits.
+
+Results are written as JSON. With ``--baseline`` each case is also compared
+against a saved run and the change in p50 latency and req/s is printed.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+import numpy as np
+
+# Mock data unless the caller chose a backend
+os.environ.setdefault("DATA_SOURCE", "mock")
+
+from app.cache import response_cache  # noqa: E402
+from app.main import app  # noqa: E402
+
+DAYS = (1, 30, 365)
+CONCURRENCY = (1, 8, 32)
+SYMBOL = "AAPL"
+
+Request = Tuple[str, str, str, bytes]  # method, path, query string, body
+
+
+def routes(days: int) -> Dict[str, Request]:
+    """One request per route for a ``days`` window"""
+    last = date.today()
+    first = date.fromordinal(last.toordinal() - days + 1)
+    batch = json.dumps({"symbols": ["AAPL", "MSFT", "GOOGL", "AMZN", "NVDA"], "days": days}).encode()
+    return {
+        "market": ("GET", f"/api/market/{SYMBOL}", urlencode({"days": days}), b""),
+        "market_columnar": ("GET", f"/api/market/{SYMBOL}", urlencode({"days": days, "format": "columnar"}), b""),
+        "market_batch": ("POST", "/api/market/batch", "", batch),
+        "news": ("GET", "/api/news", urlencode({"symbol": SYMBOL, "days": days}), b""),
+        "news_date_range": ("GET", "/api/news/date-range", urlencode(
+            {"symbol": SYMBOL, "start_date": first.isoformat(), "end_date": last.isoformat()}), b""),
+        "timeline": ("GET", "/api/timeline", urlencode({"symbol": SYMBOL, "days": days}), b""),
+        "timeline_batch": ("POST", "/api/timeline/batch", "", batch),
+    }
+
+
+async def call(request: Request) -> int:
+    """Send one request through the ASGI app and return its status code"""
+    method, path, query, body = request
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"benchmark"), (b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    sent = False
+    status = 0
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            await asyncio.sleep(3600)
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def run_case(request: Request, concurrency: int, requests: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            status = await call(request)
+            latencies.append(time.perf_counter() - started)
+            errors += status >= 400
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "rps": round(requests / elapsed, 1),
+    }
+
+
+class Lifespan:
+    """Runs the app's startup and shutdown handlers over a single lifespan connection"""
+
+    def __init__(self):
+        self._receive: "asyncio.Queue[Dict[str, str]]" = asyncio.Queue()
+        self._sent: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _event(self, message_type: str):
+        await self._receive.put({"type": f"lifespan.{message_type}"})
+        message = await self._sent.get()
+        if message["type"] != f"lifespan.{message_type}.complete":
+            raise RuntimeError(f"App {message_type} failed: {message.get('message', '')}")
+
+    async def startup(self):
+        scope = {"type": "lifespan", "asgi": {"version": "3.0"}}
+        self._task = asyncio.create_task(app(scope, self._receive.get, self._sent.put))
+        await self._event("startup")
+
+    async def shutdown(self):
+        await self._event("shutdown")
+        await self._task
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "data_source": os.environ["DATA_SOURCE"],
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, describe: Callable[[Dict[str, Any]], str]):
+    """Print each case's p50 and req/s change against a saved run"""
+    with open(baseline_path) as f:
+        baseline = {describe(case): case for case in json.load(f)["results"]}
+    for case in results:
+        before = baseline.get(describe(case))
+        if before is None:
+            continue
+        p50 = (case["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100 if before["p50_ms"] else 0.0
+        rps = (case["rps"] - before["rps"]) / before["rps"] * 100 if before["rps"] else 0.0
+        print(f"{describe(case):<40} p50 {p50:+7.1f}%  req/s {rps:+7.1f}%")
+
+
+def describe(case: Dict[str, Any]) -> str:
+    return f"{case['route']} days={case['days']} c={case['concurrency']}"
+
+
+async def main(args):
+    if not args.cache:
+        response_cache.max_bytes = 0
+    lifespan = Lifespan()
+    await lifespan.startup()
+    try:
+        return await run_cases(args)
+    finally:
+        await lifespan.shutdown()
+
+
+async def run_cases(args) -> List[Dict[str, Any]]:
+    results = []
+    for days in args.days:
+        for route, request in routes(days).items():
+            if args.routes and route not in args.routes:
+                continue
+            # Warm up lazily built state (generated news days, caches of the data layer)
+            for _ in range(3):
+                await call(request)
+            for concurrency in args.concurrency:
+                case = {"route": route, "days": days, "concurrency": concurrency}
+                case.update(await run_case(request, concurrency, args.requests))
+                results.append(case)
+                print(f"{describe(case):<40} p50 {case['p50_ms']:8.3f} ms  p95 {case['p95_ms']:8.3f} ms  "
+                      f"p99 {case['p99_ms']:8.3f} ms  {case['rps']:9.1f} req/s", file=sys.stderr)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the API routes in-process")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per case")
+    parser.add_argument("--days", type=int, nargs="+", default=list(DAYS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=list(CONCURRENCY))
+    parser.add_argument("--routes", nargs="+", help="Only these routes (see routes())")
+    parser.add_argument("--cache", action="store_true", help="Leave the response cache enabled")
+    parser.add_argument("--output", help="Write results as JSON to this file instead of stdout")
+    parser.add_argument("--baseline", help="Compare against the JSON results of an earlier run")
+    args = parser.parse_args()
+
+    report = {"benchmark": "api", "environment": environment(), "results": asyncio.run(main(args))}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.baseline:
+        compare(report["results"], args.baseline, describe)
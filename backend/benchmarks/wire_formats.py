@@ -0,0 +1,70 @@
+"""
+Size and encode-time comparison of the series wire formats.
+
+Run from the backend directory:
+
+    python -m benchmarks.wire_formats [--symbol AAPL] [--repeat 200]
+
+For the market and timeline series at 1, 30 and 365 days, prints the raw and
+gzip-compressed payload size of each format and the median time to encode it.
+"""
+
+import argparse
+import gzip
+import statistics
+import time
+from datetime import date
+
+from app.market import get_market_series
+from app.responses import ResponseFormat, encode_columns, series_response
+from app.timeline import timeline_engine
+
+WINDOWS = (1, 30, 365)
+
+
+def encoders(columns):
+    """(name, encode) pairs producing the body each format sends"""
+    return [
+        ("json rows", lambda: series_response(columns, ResponseFormat.rows).body),
+        ("json columnar", lambda: series_response(columns, ResponseFormat.columnar).body),
+        ("binary", lambda: encode_columns(columns)),
+    ]
+
+
+def median_seconds(encode, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encode()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare series wire formats")
+    parser.add_argument("--symbol", default="AAPL")
+    parser.add_argument("--repeat", type=int, default=200, help="Encodes timed per format")
+    args = parser.parse_args()
+
+    anchor = date.today()
+    series = {
+        "market": lambda days: get_market_series(args.symbol, days, anchor),
+        "timeline": lambda days: timeline_engine.timeline(args.symbol, days, anchor),
+    }
+
+    print(f"{'series':<9} {'days':>4}  {'format':<14} {'bytes':>8} {'gzip':>7} {'vs rows':>8} {'encode us':>10}")
+    for name, build in series.items():
+        for days in WINDOWS:
+            columns = build(days)._asdict()
+            baseline = None
+            for label, encode in encoders(columns):
+                body = encode()
+                baseline = baseline or len(body)
+                compressed = len(gzip.compress(body))
+                seconds = median_seconds(encode, args.repeat)
+                print(f"{name:<9} {days:>4}  {label:<14} {len(body):>8} {compressed:>7} "
+                      f"{baseline / len(body):>7.1f}x {seconds * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
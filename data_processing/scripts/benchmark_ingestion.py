@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Ingestion Benchmark
+
+Writes synthetic GDELT events zips to a temporary directory and replays them
+through the full pipeline (parse, score, match tickers, write) into a fresh
+SQLite database. Reports rows/sec and peak resident memory as JSON, so runs
+can be diffed against a saved baseline with --baseline. Where the
+``resource`` module is missing (Windows), the peak of Python allocations
+traced by ``tracemalloc`` is reported instead of resident memory; tracing
+slows the run, so compare such results only with each other.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from benchmark_ticker_matching import make_events_file
+from process_gdelt import (
+    DEFAULT_SCORE_BATCH_SIZE, DEFAULT_TICKER_ALIASES, Base, GdeltPipeline, SentimentScorer,
+    TickerMatcher, list_local_gdelt_files, logger,
+)
+
+def peak_rss_mb(who):
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(resource.getrusage(who).ru_maxrss / scale, 1)
+
+def peak_memory():
+    if resource is None:
+        return {'peak_traced_mb': round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)}
+    return {
+        'peak_rss_mb': peak_rss_mb(resource.RUSAGE_SELF),
+        'peak_child_rss_mb': peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+def run(args, directory):
+    for index in range(args.files):
+        path = os.path.join(directory, f"2025010100{index:02d}00.export.CSV.zip")
+        with open(path, 'wb') as f:
+            f.write(make_events_file(args.rows, seed=index, first_id=index * args.rows + 1).getvalue())
+    file_urls = list_local_gdelt_files(directory)
+
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'benchmark.db')}")
+    Base.metadata.create_all(engine)
+    scorer = None
+    if args.sentiment == 'vader':
+        scorer = SentimentScorer(args.score_workers, DEFAULT_SCORE_BATCH_SIZE)
+    pipeline = GdeltPipeline(
+        engine,
+        scorer=scorer,
+        matcher=TickerMatcher.from_csv(DEFAULT_TICKER_ALIASES),
+    )
+
+    if resource is None:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        committed = pipeline.run(file_urls)
+    finally:
+        if scorer is not None:
+            scorer.close()
+    elapsed = time.perf_counter() - started
+    memory = peak_memory()
+    tracemalloc.stop()
+    engine.dispose()
+
+    rows = args.files * args.rows
+    return {
+        'files': args.files,
+        'rows_per_file': args.rows,
+        'sentiment': args.sentiment,
+        'score_workers': args.score_workers,
+        'committed_files': committed,
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(rows / elapsed, 1),
+        **memory,
+    }
+
+def compare(result, baseline_path):
+    with open(baseline_path) as f:
+        before = json.load(f)['results'][0]
+    for key in ('rows_per_sec', 'peak_rss_mb', 'peak_traced_mb'):
+        if key not in result or key not in before:
+            continue
+        change = (result[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+        logger.info(f"{key}: {before[key]} -> {result[key]} ({change:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark GDELT ingestion into SQLite')
+    parser.add_argument('--files', type=int, default=4, help='Synthetic export files to ingest')
+    parser.add_argument('--rows', type=int, default=50000, help='Events per file')
+    parser.add_argument('--sentiment', choices=['vader', 'tone'], default='vader')
+    parser.add_argument('--score-workers', type=int, default=2, help='Sentiment scoring processes')
+    parser.add_argument('--output', help='Write results as JSON to this file instead of stdout')
+    parser.add_argument('--baseline', help='Compare against the JSON results of an earlier run')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        result = run(args, directory)
+    report = {'benchmark': 'ingestion', 'environment': environment(), 'results': [result]}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.baseline:
+        compare(result, args.baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Ticker Matching Benchmark
+
+Builds a synthetic GDELT events file (or reads a real one), parses it with the
+ingestion pipeline's parser and reports how fast ticker matching runs
+compared with parsing itself. Matching keeps pace with ingestion when its
+rows/sec is well above the parse rate.
+"""
+
+import argparse
+import io
+import random
+import time
+import zipfile
+
+from process_gdelt import (
+    DEFAULT_TICKER_ALIASES, EVENT_SCHEMA, GDELT_EVENT_COLUMNS, TickerMatcher,
+    iter_gdelt_chunks, logger, parse_gdelt_data,
+)
+
+# Actor names as GDELT writes them, with and without a company among them
+ACTORS = [
+    'UNITED STATES', 'CHINA', 'PRESIDENT', 'POLICE', 'GOVERNMENT', 'BUSINESS',
+    'APPLE', 'MICROSOFT', 'GOLDMAN SACHS', 'TESLA', 'WALMART', 'BOEING', '',
+]
+SLUG_WORDS = [
+    'markets', 'stocks', 'earnings', 'rally', 'report', 'inflation', 'rates',
+    'apple', 'nvidia', 'bank-of-america', 'jpmorgan', 'oil', 'election', 'tech',
+]
+DOMAINS = ['reuters.com', 'bloomberg.com', 'cnbc.com', 'ft.com', 'wsj.com', 'news.example.org']
+
+def make_events_file(rows, seed=0, first_id=1):
+    """A zipped GDELT events export of ``rows`` synthetic events numbered from ``first_id``"""
+    rng = random.Random(seed)
+    columns = {name: index for index, name in enumerate(GDELT_EVENT_COLUMNS)}
+    lines = []
+    for event_id in range(first_id, first_id + rows):
+        fields = [''] * len(GDELT_EVENT_COLUMNS)
+        fields[columns['GLOBALEVENTID']] = str(event_id)
+        fields[columns['SQLDATE']] = '20250101'
+        fields[columns['Actor1Name']] = rng.choice(ACTORS)
+        fields[columns['Actor2Name']] = rng.choice(ACTORS)
+        fields[columns['AvgTone']] = f"{rng.uniform(-10, 10):.4f}"
+        slug = '-'.join(rng.sample(SLUG_WORDS, 4))
+        fields[columns['SOURCEURL']] = f"https://www.{rng.choice(DOMAINS)}/2025/01/01/{slug}-{event_id}.html"
+        lines.append('\t'.join(fields))
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as z:
+        z.writestr('20250101000000.export.CSV', '\n'.join(lines) + '\n')
+    buffer.seek(0)
+    return buffer
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ticker matching against GDELT parsing')
+    parser.add_argument('--rows', type=int, default=200000, help='Synthetic events to generate')
+    parser.add_argument('--input', help='Benchmark this GDELT events zip instead of a synthetic one')
+    parser.add_argument('--ticker-aliases', default=DEFAULT_TICKER_ALIASES, help='CSV of symbol,alias rows')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    matcher = TickerMatcher.from_csv(args.ticker_aliases)
+    logger.info(f"Built automaton of {len(matcher.goto)} states in {time.perf_counter() - started:.3f}s")
+
+    fileobj = open(args.input, 'rb') if args.input else make_events_file(args.rows)
+    parse_time = match_time = 0.0
+    rows = matched = 0
+    with fileobj:
+        chunks = iter_gdelt_chunks(fileobj, schema=EVENT_SCHEMA)
+        while True:
+            started = time.perf_counter()
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+            parsed = parse_gdelt_data(chunk, EVENT_SCHEMA)
+            parse_time += time.perf_counter() - started
+
+            started = time.perf_counter()
+            symbols = matcher.match_articles(parsed)
+            match_time += time.perf_counter() - started
+            rows += len(parsed)
+            matched += int((symbols.map(len) > 0).sum())
+
+    logger.info(f"Parsed {rows} rows in {parse_time:.2f}s ({rows / parse_time:.0f} rows/sec)")
+    logger.info(f"Matched {rows} rows in {match_time:.2f}s ({rows / match_time:.0f} rows/sec), "
+                f"{matched} mention at least one ticker")
+
+if __name__ == "__main__":
+    main()